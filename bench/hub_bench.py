@@ -0,0 +1,312 @@
+"""
+MCP Hub 压测工具：启动 main.py，用 N 个并发 MCP 客户端（SSE）按比例混合调用各工具，
+统计每个工具的吞吐与 p50/p95/p99 延迟，并把结果保存成 JSON 便于前后对比。
+
+所有依赖都在本地：git 工具操作临时仓库，web_search_url 抓取本地 HTTP 服务器上的页面
+（默认 mode=http，不启动 Chrome），日历工具写入临时目录中的 .ics 文件。
+
+用法示例：
+    python bench/hub_bench.py --clients 20 --duration 30
+    python bench/hub_bench.py --mix add=5,web_search_url=5 --compare bench/results/baseline.json
+    python bench/hub_bench.py --mix add_calendar_event=30,add_calendar_events=1
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "add=4,divide=2,get_current_time=2,git_manage=1,web_search_url=1"
+_CALENDAR_BATCH = 30  # add_calendar_events 每次调用写入的条目数
+_PAGE_PARAGRAPH = "MCP Hub benchmark page. This paragraph is static text served from a local HTTP server. "
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the MCP hub over SSE with local stand-ins")
+    parser.add_argument("--clients", type=int, default=10, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=20, help="压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=2, help="预热时长（秒），不计入统计")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="工具调用比例，如 add=4,git_manage=1")
+    parser.add_argument("--repos", type=int, default=5, help="git_manage 使用的临时仓库数量")
+    parser.add_argument("--pages", type=int, default=20, help="本地 HTTP 服务器生成的页面数量")
+    parser.add_argument("--web-mode", default="http", choices=["auto", "http", "browser"],
+                        help="web_search_url 的 mode；默认 http，不依赖 Chrome")
+    parser.add_argument("--cache", action="store_true", help="开启网页缓存（默认关闭，以测量真实抓取）")
+    parser.add_argument("--port", type=int, default=0, help="hub 端口，0 表示自动选择")
+    parser.add_argument("--hub-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="传给 hub 进程的额外环境变量，可重复")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果 JSON 路径，默认 bench/results/<时间戳>.json")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    return parser.parse_args()
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_repos(root: str, count: int) -> list:
+    env = {**os.environ, "GIT_AUTHOR_NAME": "bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+           "GIT_COMMITTER_NAME": "bench", "GIT_COMMITTER_EMAIL": "bench@example.com"}
+    repos = []
+    for i in range(count):
+        path = os.path.join(root, f"repo{i}")
+        os.makedirs(path)
+        subprocess.run(["git", "init", "-q", "-b", "main"], cwd=path, check=True, env=env)
+        for j in range(3):
+            with open(os.path.join(path, f"file{j}.txt"), "w") as f:
+                f.write(f"repo {i} file {j}\n")
+            subprocess.run(["git", "add", "."], cwd=path, check=True, env=env)
+            subprocess.run(["git", "commit", "-q", "-m", f"commit {j}"], cwd=path, check=True, env=env)
+        repos.append(path)
+    return repos
+
+
+def start_http_server(root: str, pages: int):
+    for i in range(pages):
+        body = "".join(f"<p>{_PAGE_PARAGRAPH * 3}</p>" for _ in range(20))
+        with open(os.path.join(root, f"page{i}.html"), "w") as f:
+            f.write(f"<html><head><title>Page {i}</title></head><body><nav>menu</nav>"
+                    f"<article><h1>Page {i}</h1>{body}</article><footer>footer</footer></body></html>")
+
+    class _QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=root))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_hub(port: int, args, workdir: str):
+    env = {
+        **os.environ,
+        "MCP_HUB_HOST": "127.0.0.1",
+        "MCP_HUB_PORT": str(port),
+        "MCP_HUB_SERVICES": "system,math,git,web,calendar",
+        # 日历写入本地 .ics 文件，macOS 上也不会改动系统日历
+        "CALENDAR_BACKEND": "ics",
+        "CALENDAR_ICS_PATH": os.path.join(workdir, "calendar.ics"),
+        "WEB_SEARCH_CACHE_TTL": os.environ.get("WEB_SEARCH_CACHE_TTL", "600") if args.cache else "0",
+    }
+    for item in args.hub_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    log = open(os.path.join(workdir, "hub.log"), "w")
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"hub exited early, see {log.name}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("hub did not start listening within 30s")
+
+
+def build_calls(repos: list, base_url: str, pages: int, web_mode: str) -> dict:
+    """每个工具对应一个生成参数的函数"""
+    return {
+        "add": lambda rnd: {"a": rnd.random() * 100, "b": rnd.random() * 100},
+        "divide": lambda rnd: {"a": rnd.random() * 100, "b": rnd.random() * 100 + 1},
+        "math_eval": lambda rnd: {"expressions": ["m = mean(xs)", "percentile(xs, 95) - m", "dot(xs, xs)"],
+                                  "variables": {"xs": [rnd.random() for _ in range(rnd.choice([10, 5000]))]}},
+        "get_current_time": lambda rnd: {},
+        "sys_info": lambda rnd: {},
+        "git_manage": lambda rnd: {"repo_path": rnd.choice(repos), "action": rnd.choice(["status", "log"])},
+        "web_search_url": lambda rnd: {"url": f"{base_url}/page{rnd.randrange(pages)}.html", "mode": web_mode},
+        "add_calendar_event": lambda rnd: _calendar_event(rnd),
+        "add_calendar_events": lambda rnd: {"events": [_calendar_event(rnd) for _ in range(_CALENDAR_BATCH)]},
+    }
+
+
+def _calendar_event(rnd) -> dict:
+    start = datetime.datetime(2026, 1, 1) + datetime.timedelta(hours=rnd.randrange(24 * 365))
+    return {"title": f"bench event {rnd.randrange(10 ** 6)}", "start_time": start.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+async def run_client(url, mix, calls, stop_at, record_after, seed, samples, errors):
+    rnd = random.Random(seed)
+    tools, weights = list(mix), list(mix.values())
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.monotonic() < stop_at:
+                tool = rnd.choices(tools, weights)[0]
+                arguments = calls[tool](rnd)
+                start = time.monotonic()
+                try:
+                    result = await session.call_tool(tool, arguments)
+                    failed = result.isError
+                except Exception:
+                    failed = True
+                end = time.monotonic()
+                if start < record_after:
+                    continue
+                samples.setdefault(tool, []).append(end - start)
+                if failed:
+                    errors[tool] = errors.get(tool, 0) + 1
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(samples: dict, errors: dict, elapsed: float) -> dict:
+    tools = {}
+    for tool, latencies in sorted(samples.items()):
+        tools[tool] = {
+            "count": len(latencies),
+            "errors": errors.get(tool, 0),
+            "throughput": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        }
+    all_latencies = [v for latencies in samples.values() for v in latencies]
+    total = {
+        "count": len(all_latencies),
+        "errors": sum(errors.values()),
+        "throughput": round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(all_latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 2),
+    }
+    return {"tools": tools, "total": total}
+
+
+def print_report(summary: dict):
+    header = f"{'tool':<20}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for tool, row in list(summary["tools"].items()) + [("TOTAL", summary["total"])]:
+        print(f"{tool:<20}{row['count']:>8}{row['errors']:>8}{row['throughput']:>10}"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+
+
+def print_comparison(current: dict, baseline: dict):
+    print(f"\n对比基线 {baseline.get('timestamp', '')}（吞吐为正表示提升，延迟为正表示变慢）")
+    print(f"{'tool':<20}{'req/s':>12}{'p50':>12}{'p95':>12}{'p99':>12}")
+    rows = list(current["summary"]["tools"].items()) + [("TOTAL", current["summary"]["total"])]
+    for tool, row in rows:
+        base = baseline["summary"]["tools"].get(tool) if tool != "TOTAL" else baseline["summary"]["total"]
+        if not base:
+            continue
+        cells = [_delta(row["throughput"], base["throughput"])]
+        cells += [_delta(row[k], base[k]) for k in ("p50_ms", "p95_ms", "p99_ms")]
+        print(f"{tool:<20}" + "".join(f"{c:>12}" for c in cells))
+
+
+def _delta(value, base) -> str:
+    if not base:
+        return "n/a"
+    return f"{(value - base) / base * 100:+.1f}%"
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def main_async(args):
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory(prefix="mcp-hub-bench-") as workdir:
+        repos = make_repos(os.path.join(workdir, "repos"), args.repos) if "git_manage" in mix else []
+        site = os.path.join(workdir, "site")
+        os.makedirs(site)
+        server = start_http_server(site, args.pages)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        calls = build_calls(repos, base_url, args.pages, args.web_mode)
+        unknown = [tool for tool in mix if tool not in calls]
+        if unknown:
+            raise SystemExit(f"Unsupported tools in --mix: {', '.join(unknown)}")
+
+        port = args.port or free_port()
+        hub = start_hub(port, args, workdir)
+        try:
+            samples, errors = {}, {}
+            started = time.monotonic()
+            record_after = started + args.warmup
+            stop_at = record_after + args.duration
+            await asyncio.gather(*[
+                run_client(f"http://127.0.0.1:{port}/sse", mix, calls, stop_at, record_after,
+                           args.seed + i, samples, errors)
+                for i in range(args.clients)
+            ])
+            elapsed = time.monotonic() - record_after
+        finally:
+            hub.terminate()
+            try:
+                hub.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                hub.kill()
+            server.shutdown()
+
+    summary = summarize(samples, errors, elapsed)
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "params": {"clients": args.clients, "duration": args.duration, "mix": mix, "repos": args.repos,
+                   "pages": args.pages, "web_mode": args.web_mode, "cache": args.cache,
+                   "hub_env": args.hub_env},
+        "elapsed": round(elapsed, 3),
+        "summary": summary,
+    }
+
+
+def main():
+    args = parse_args()
+    result = asyncio.run(main_async(args))
+    print_report(result["summary"])
+
+    output = args.output or os.path.join(ROOT, "bench", "results",
+                                         datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,34 @@
+import os
+
 from mcp.server.fastmcp import FastMCP
 
-from services.calendar_service import CalendarService
-# from services.file_service import FileService  # 复用之前的服务类
-from services.git_service import GitService
-from services.math_service import MathService
-from services.system_service import SystemService
-from services.web_search_service import WebSearch
+from services.metrics import register_metrics_route
+from services.registry import register_services
 
 # 创建 Hub
 hub = FastMCP("HTTP-MCP-Hub")
+# 监听地址可通过环境变量覆盖，便于压测或同机运行多个实例
+hub.settings.host = os.getenv("MCP_HUB_HOST", hub.settings.host)
+hub.settings.port = int(os.getenv("MCP_HUB_PORT", hub.settings.port))
+# 多 worker 模式下由前置进程为每个 worker 分配带编号的消息路径，用于会话粘滞
+hub.settings.message_path = os.getenv("MCP_HUB_MESSAGE_PATH", hub.settings.message_path)
+
+# 多进程模式下当前进程只负责前置转发，工具由各 worker 进程（MCP_HUB_WORKERS=1）自行注册
+workers = int(os.getenv("MCP_HUB_WORKERS", "1"))
 
-# 注册子服务工具
-# FileService().register_tools(hub)
-SystemService().register_tools(hub)
-MathService().register_tools(hub)
-WebSearch().register_tools(hub)
-GitService().register_tools(hub)
-CalendarService().register_tools(hub)
+if workers <= 1:
+    # 注册子服务工具：通过 MCP_HUB_SERVICES 或 MCP_HUB_CONFIG 选择要启用的服务
+    register_services(hub)
+    # 调用次数、耗时分布等 Prometheus 指标：GET /metrics
+    register_metrics_route(hub)
 
 if __name__ == "__main__":
     # 使用 sse 运行模式
     # 这会启动一个服务器，默认监听 http://localhost:8000
-    hub.run(transport="sse")
\ No newline at end of file
+    if workers > 1:
+        # 多进程模式：前置进程监听上面的地址，把会话分给各 worker 进程
+        from services.workers import run_workers
+
+        run_workers(os.path.abspath(__file__), workers, hub.settings.host, hub.settings.port)
+    else:
+        hub.run(transport="sse")
@@ -0,0 +1,314 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+
+from services.metrics import REGISTRY, phase
+
+logger = logging.getLogger(__name__)
+
+# 默认只限制重型工具：web 抓取会启动 Chrome，git 工具会起子进程；键可以是服务名或工具名，工具名优先叠加。
+# web 与 git 都按工具限制：web_search_more、git_repo_state 这类读缓存的轻量工具用于轮询，
+# 不必排在浏览器调用或长时间的克隆、批量操作后面
+_DEFAULT_LIMITS = {
+    "web_search_url": {"max_concurrency": 4, "max_queue": 16, "timeout": 90},
+    "web_search_query": {"max_concurrency": 2, "max_queue": 4, "timeout": 60},
+    "git_manage": {"max_concurrency": 4, "max_queue": 32, "timeout": 300},
+    "git_clone": {"max_concurrency": 2, "max_queue": 8, "timeout": 900},
+    "git_bulk": {"max_concurrency": 2, "max_queue": 4, "timeout": 600},
+    # 大数组的统计在 math 执行器的线程中进行，限制并发与耗时，避免占满 CPU
+    "math_eval": {"max_concurrency": 2, "max_queue": 16, "timeout": 30},
+}
+
+TOOL_REJECTED = REGISTRY.counter(
+    "mcp_hub_tool_rejected_total", "Tool calls rejected or cut off by admission control", ("service", "tool", "reason"))
+TOOL_QUEUED = REGISTRY.gauge("mcp_hub_tool_queued", "Tool calls waiting for an admission slot", ("limit",))
+
+# 当前调用的取消范围；执行器会把 contextvars 带进线程池，阻塞代码借此注册超时后的清理动作
+_current_scope = contextvars.ContextVar("mcp_hub_cancel_scope", default=None)
+
+
+class AdmissionRejected(RuntimeError):
+    """工具繁忙（排队已满）或客户端超过调用频率时快速拒绝"""
+
+
+@dataclass
+class Limit:
+    max_concurrency: int = 0  # 同时执行的调用数上限，0 为不限制
+    max_queue: int = 0  # 超过并发上限后允许排队等待的调用数，队列满时直接拒绝
+    timeout: float = 0  # 单次调用（含排队）的截止时间（秒），0 为不限制
+    rate: float = 0  # 每个客户端每秒允许的调用数，0 为不限制
+    burst: int = 0  # 令牌桶容量，默认等于 max(1, rate)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Limit":
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Unknown limit options: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+class CancelScope:
+    """一次工具调用的取消范围：超时或被取消时依次执行已注册的回调（例如关闭浏览器、杀掉子进程）。
+
+    cancel() 由事件循环调用，而回调通常会阻塞（driver.quit() 要同步等待 chromedriver 退出），
+    因此回调放到后台线程执行，不能卡住其他客户端。
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add(self, callback):
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        _run_callback(callback)
+
+    def remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        if callbacks:
+            threading.Thread(target=_run_callbacks, args=(callbacks[::-1],), name="cancel-callbacks",
+                             daemon=True).start()
+
+
+def _run_callbacks(callbacks):
+    for callback in callbacks:
+        _run_callback(callback)
+
+
+def _run_callback(callback):
+    try:
+        callback()
+    except Exception:
+        logger.debug("Cancel callback failed", exc_info=True)
+
+
+@contextmanager
+def on_cancel(callback):
+    """当前工具调用超时或被取消时执行 callback，可在线程池中使用::
+
+        with on_cancel(driver.quit):
+            driver.get(url)
+    """
+    scope = _current_scope.get()
+    if scope is None:
+        yield
+        return
+    scope.add(callback)
+    try:
+        yield
+    finally:
+        scope.remove(callback)
+
+
+def detached_context():
+    """复制当前上下文但换上一个独立的取消范围，返回 (context, scope)。
+
+    供多个调用共享的后台任务使用（见 SingleFlight）：任务不继承发起者的取消范围，
+    某个调用方超时或断开不会触发共享工作上注册的回调；由持有者在合适的时候调用 scope.cancel()。
+    """
+    context = contextvars.copy_context()
+    scope = CancelScope()
+    context.run(_current_scope.set, scope)
+    return context, scope
+
+
+def cancel_requested() -> bool:
+    """当前工具调用是否已超时或被取消，供阻塞循环自行检查"""
+    scope = _current_scope.get()
+    return scope is not None and scope.cancelled
+
+
+class _Gate:
+    """并发上限 + 有界等待队列；释放时把名额直接交给队首的等待者，保证先来先服务"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._running = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        if self._running < self.max_concurrency and not self._waiters:
+            self._running += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected(f"服务繁忙：{self.name} 正在执行 {self._running} 个调用且排队已满，请稍后重试")
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        TOOL_QUEUED.inc(self.name)
+        try:
+            with phase("admission_wait"):
+                await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已经交给了我们，但调用方已放弃，转交给下一个等待者
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        finally:
+            TOOL_QUEUED.dec(self.name)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._running -= 1
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class AdmissionController:
+    """按工具/服务配置的准入控制：并发上限、有界排队、截止时间与按客户端的调用频率限制。
+
+    同时配置了服务级与工具级限制时并发与频率限制都生效（先占工具名额再占服务名额），截止时间以工具级为准。
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = {name: Limit.from_dict(options) for name, options in limits.items()}
+        self._gates = {}
+        # 按 MCP 会话（即一个客户端连接）记录令牌桶，会话结束后自动释放
+        self._buckets = weakref.WeakKeyDictionary()
+
+    def wrap(self, fn, tool: str, service: str):
+        names = [name for name in (tool, service) if name in self.limits]
+        if not names:
+            return fn
+        limits = [self.limits[name] for name in names]
+        # 截止时间取最具体的配置：工具级优先于服务级
+        timeout = next((limit.timeout for limit in limits if limit.timeout), 0)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            for name, limit in zip(names, limits):
+                if limit.rate and not self._take_token(name, limit):
+                    TOOL_REJECTED.inc(service, tool, "rate_limited")
+                    raise AdmissionRejected(f"调用过于频繁：{name} 每个客户端每秒最多 {limit.rate:g} 次")
+
+            scope = CancelScope()
+            token = _current_scope.set(scope)
+            start = time.monotonic()
+            try:
+                call = self._admit_and_call(names, limits, service, tool, fn, args, kwargs)
+                if timeout:
+                    return await asyncio.wait_for(call, timeout)
+                return await call
+            except BaseException as e:
+                # 超时或调用方断开：通知线程池中的阻塞工作（浏览器等）尽快放弃
+                scope.cancel()
+                if isinstance(e, asyncio.TimeoutError) and timeout and time.monotonic() - start >= timeout:
+                    TOOL_REJECTED.inc(service, tool, "deadline")
+                    raise TimeoutError(f"{tool} 超过截止时间 {timeout:g}s，已取消") from None
+                raise
+            finally:
+                _current_scope.reset(token)
+
+        return wrapper
+
+    async def _admit_and_call(self, names, limits, service, tool, fn, args, kwargs):
+        acquired = []
+        try:
+            for name, limit in zip(names, limits):
+                if not limit.max_concurrency:
+                    continue
+                gate = self._gate(name, limit)
+                try:
+                    await gate.acquire()
+                except AdmissionRejected:
+                    TOOL_REJECTED.inc(service, tool, "busy")
+                    raise
+                acquired.append(gate)
+            result = fn(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        finally:
+            for gate in reversed(acquired):
+                gate.release()
+
+    def _gate(self, name: str, limit: Limit) -> _Gate:
+        gate = self._gates.get(name)
+        if gate is None:
+            gate = self._gates[name] = _Gate(name, limit.max_concurrency, limit.max_queue)
+        return gate
+
+    def _take_token(self, name: str, limit: Limit) -> bool:
+        session = _current_session()
+        if session is None:
+            return True
+        buckets = self._buckets.setdefault(session, {})
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = _TokenBucket(limit.rate, limit.burst)
+        return bucket.take()
+
+
+def _current_session():
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+
+        return request_ctx.get().session
+    except (ImportError, LookupError):
+        return None
+
+
+def load_limits(config: dict = None) -> dict:
+    """合并默认限制、配置文件中的 limits 与环境变量 MCP_HUB_LIMITS（JSON），例如::
+
+        MCP_HUB_LIMITS='{"web": {"max_concurrency": 2}, "add": {"rate": 20}, "git_clone": null}'
+
+    后者按键覆盖前者的同名选项；某个键设为 null 表示去掉该限制。
+    """
+    limits = {name: dict(options) for name, options in _DEFAULT_LIMITS.items()}
+    overrides = [(config or {}).get("limits") or {}]
+    env = os.getenv("MCP_HUB_LIMITS")
+    if env:
+        overrides.append(json.loads(env))
+    for override in overrides:
+        for name, options in override.items():
+            if options is None:
+                limits.pop(name, None)
+            else:
+                limits[name] = {**limits.get(name, {}), **options}
+    return limits
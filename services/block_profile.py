@@ -0,0 +1,71 @@
+import os
+import weakref
+from urllib.parse import urlsplit
+
+
+def _env_list(name: str, default: str = ""):
+    return [item.strip().lower() for item in os.getenv(name, default).split(",") if item.strip()]
+
+
+# 需要拦截的资源类型，可选 image/font/media/stylesheet；设为 off 关闭全部拦截（含广告统计域名）
+_BLOCK_RESOURCES = _env_list("WEB_SEARCH_BLOCK_RESOURCES", "image,font,media")
+# 额外拦截的域名（追加到内置的广告/统计域名列表之后）
+_BLOCK_DOMAINS = _env_list("WEB_SEARCH_BLOCK_DOMAINS")
+# 拦截后会出问题的站点，访问这些域名时不做任何拦截
+_BLOCK_ALLOWLIST = _env_list("WEB_SEARCH_BLOCK_ALLOWLIST")
+
+_RESOURCE_EXTENSIONS = {
+    "image": ["png", "jpg", "jpeg", "gif", "webp", "avif", "bmp", "ico", "svg"],
+    "font": ["woff", "woff2", "ttf", "otf", "eot"],
+    "media": ["mp4", "webm", "m3u8", "ts", "mp3", "m4a", "ogg", "wav", "flv"],
+    "stylesheet": ["css"],
+}
+
+_AD_DOMAINS = [
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "facebook.net",
+    "connect.facebook.net", "scorecardresearch.com", "hotjar.com", "criteo.com", "taboola.com",
+    "outbrain.com", "amazon-adsystem.com", "adnxs.com", "hm.baidu.com", "cpro.baidu.com",
+    "pos.baidu.com", "cnzz.com", "umeng.com", "mediav.com", "tanx.com", "mmstat.com",
+]
+
+# driver -> 当前标签页生效的拦截规则，避免重复下发 CDP 命令；规则只作用于当前标签页
+_applied = weakref.WeakKeyDictionary()
+
+
+def blocked_url_patterns():
+    """生成 CDP Network.setBlockedURLs 使用的通配规则"""
+    if "off" in _BLOCK_RESOURCES:
+        return []
+    patterns = []
+    for resource in _BLOCK_RESOURCES:
+        for ext in _RESOURCE_EXTENSIONS.get(resource, []):
+            patterns.extend([f"*.{ext}", f"*.{ext}?*"])
+    for domain in _AD_DOMAINS + _BLOCK_DOMAINS:
+        patterns.extend([f"*://{domain}/*", f"*.{domain}/*"])
+    return patterns
+
+
+_PATTERNS = blocked_url_patterns()
+_NO_PATTERNS = []
+
+
+def is_allowlisted(url: str) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    return any(host == d or host.endswith("." + d) for d in _BLOCK_ALLOWLIST)
+
+
+def apply_blocking(driver, url: str):
+    """导航前根据目标站点下发拦截规则；白名单站点清空规则"""
+    patterns = _NO_PATTERNS if is_allowlisted(url) else _PATTERNS
+    if _applied.get(driver) is patterns:
+        return
+    if driver not in _applied:
+        driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    _applied[driver] = patterns
+
+
+def reset_blocking(driver):
+    """切换到新标签页后调用，下次导航时重新下发规则"""
+    _applied.pop(driver, None)
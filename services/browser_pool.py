@@ -0,0 +1,340 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from services.admission import cancel_requested, on_cancel
+from services.block_profile import apply_blocking, reset_blocking
+from services.metrics import phase
+
+logger = logging.getLogger(__name__)
+
+_USER_AGENT = (
+    "user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+_POOL_SIZE = int(os.getenv("WEB_SEARCH_POOL_SIZE", "3"))  # 同时存活的浏览器上限
+_POOL_WARM = int(os.getenv("WEB_SEARCH_POOL_WARM", "1"))  # 预热启动的浏览器数量
+# 是否在注册工具时就预热；默认在首次调用时才导入 selenium 并预热，未使用 web 工具的部署不付出启动成本
+_POOL_WARM_ON_START = os.getenv("WEB_SEARCH_POOL_WARM_ON_START", "0") == "1"
+_POOL_MAX_USES = int(os.getenv("WEB_SEARCH_POOL_MAX_USES", "50"))  # 单个浏览器最多复用次数
+_POOL_IDLE_TIMEOUT = int(os.getenv("WEB_SEARCH_POOL_IDLE_TIMEOUT", "300"))  # 空闲多少秒后回收
+_POOL_MAX_MEMORY_MB = int(os.getenv("WEB_SEARCH_POOL_MAX_MEMORY_MB", "1024"))  # 单个浏览器内存上限，0 为不限制
+# 每复用多少次检查一次内存：统计进程树需要执行一次 ps，不在每次归还时都做
+_POOL_MEMORY_CHECK_EVERY = int(os.getenv("WEB_SEARCH_POOL_MEMORY_CHECK_EVERY", "10"))
+_POOL_ACQUIRE_TIMEOUT = int(os.getenv("WEB_SEARCH_POOL_ACQUIRE_TIMEOUT", "60"))
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def build_chrome_options():
+    """web_search_url 与 web_search_query 共用的 Chrome 启动参数"""
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_options = Options()
+    chrome_options.add_argument("--headless")  # 无头模式
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    # 只需要页面文字：静音、禁止自动播放与扩展，降低单个浏览器的内存占用
+    chrome_options.add_argument("--mute-audio")
+    chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+    chrome_options.add_argument("--disable-extensions")
+    # 伪装成普通用户浏览器
+    chrome_options.add_argument(_USER_AGENT)
+    return chrome_options
+
+
+def resolve_driver_path() -> str:
+    """只解析一次 ChromeDriver 路径，避免每次调用都走 webdriver_manager 的网络检查"""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            from webdriver_manager.chrome import ChromeDriverManager
+
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+class _PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def is_alive(self) -> bool:
+        try:
+            self.driver.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def abort(self):
+        self.broken = True
+        self.quit()
+
+    def quit(self):
+        try:
+            self.driver.quit()  # 必须关闭浏览器进程，否则会占用大量内存
+        except Exception:
+            logger.debug("Failed to quit chrome driver", exc_info=True)
+
+
+class BrowserPool:
+    """预热、可复用的 Chrome 浏览器池。
+
+    每次借出时打开一个全新标签页并清理 cookie / storage，保证调用之间互不干扰；
+    浏览器在达到复用次数、超过内存上限、空闲超时或崩溃后被回收。
+    """
+
+    def __init__(self, size: int = _POOL_SIZE, max_uses: int = _POOL_MAX_USES,
+                 idle_timeout: int = _POOL_IDLE_TIMEOUT, max_memory_mb: int = _POOL_MAX_MEMORY_MB,
+                 memory_check_every: int = _POOL_MEMORY_CHECK_EVERY):
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.idle_timeout = idle_timeout
+        self.max_memory_mb = max_memory_mb
+        self.memory_check_every = max(1, memory_check_every)
+        self._idle = []  # 空闲浏览器，后进先出以便冷的那个先超时回收
+        self._total = 0  # 已创建且未回收的浏览器数量（含借出中的）
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._closed = False
+        self._warmed = False
+
+    def warm(self, count: int = _POOL_WARM):
+        """在后台线程中预先启动若干浏览器"""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+        count = min(count, self.size)
+
+        def _run():
+            for _ in range(count):
+                with self._cond:
+                    if self._closed or self._total >= count:
+                        return
+                    self._total += 1
+                try:
+                    browser = self._start_browser()
+                except Exception as e:
+                    # 没有 Chrome 的环境仍可使用 HTTP 抓取，这里只记录一行警告
+                    logger.warning("Failed to warm up chrome: %s", e)
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    return
+                self._checkin(browser)
+
+        threading.Thread(target=_run, name="browser-pool-warm", daemon=True).start()
+
+    @contextmanager
+    def session(self, page_load_timeout: int = 30, acquire_timeout: int = _POOL_ACQUIRE_TIMEOUT):
+        """借出一个干净的浏览器会话，用法: ``with pool.session() as driver: ...``"""
+        browser = self._acquire(acquire_timeout)
+        try:
+            self._reset_session(browser)
+            browser.driver.set_page_load_timeout(page_load_timeout)
+        except Exception:
+            browser.broken = True
+            self._release(browser)
+            raise
+        try:
+            # 工具调用超时或被取消时直接关掉浏览器，让阻塞中的 driver 调用立即失败并回收该实例
+            with on_cancel(browser.abort):
+                yield browser.driver
+        except Exception:
+            # 调用方报错时顺便确认浏览器是否已经崩溃
+            if not browser.is_alive():
+                browser.broken = True
+            raise
+        finally:
+            self._release(browser)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for browser in idle:
+            browser.quit()
+
+    def _acquire(self, timeout: int) -> _PooledBrowser:
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._ensure_reaper()
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待空闲浏览器超时（{timeout}s）")
+                if cancel_requested():
+                    raise RuntimeError("调用已取消，不再等待空闲浏览器")
+                self._cond.wait(min(remaining, 1))
+        try:
+            browser = self._start_browser()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        if not self._warmed:
+            # 首次使用时自己的浏览器启动完成后，再在后台补齐其余预热浏览器；
+            # 预热线程按已有数量计数，不会与这里同时拉起两个 Chrome
+            self.warm()
+        return browser
+
+    def _release(self, browser: _PooledBrowser):
+        browser.uses += 1
+        browser.last_used = time.monotonic()
+        if browser.broken or not browser.is_alive():
+            self._discard(browser, "crashed")
+        elif self.max_uses and browser.uses >= self.max_uses:
+            self._discard(browser, "max uses reached")
+        elif (self.max_memory_mb and browser.uses % self.memory_check_every == 0
+              and _process_tree_rss_mb(browser.driver) > self.max_memory_mb):
+            self._discard(browser, "memory limit exceeded")
+        else:
+            self._checkin(browser)
+
+    def _checkin(self, browser: _PooledBrowser):
+        with self._cond:
+            if self._closed:
+                self._total -= 1
+                browser.quit()
+                return
+            self._idle.append(browser)
+            self._cond.notify()
+
+    def _discard(self, browser: _PooledBrowser, reason: str):
+        logger.info("Recycling chrome (%s, uses=%d)", reason, browser.uses)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+        browser.quit()
+
+    def _start_browser(self) -> _PooledBrowser:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        with phase("browser_start"):
+            service = Service(resolve_driver_path())
+            driver = webdriver.Chrome(service=service, options=build_chrome_options())
+        return _PooledBrowser(driver)
+
+    def _reset_session(self, browser: _PooledBrowser):
+        driver = browser.driver
+        if browser.uses == 0:
+            return
+        # 清理上一个调用留下的登录态与本地存储
+        try:
+            origin = _origin_of(driver.current_url)
+            if origin:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin",
+                                       {"origin": origin, "storageTypes": "all"})
+        except Exception:
+            logger.debug("Failed to clear storage for previous origin", exc_info=True)
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        # 新开标签页并关闭旧的，避免残留页面状态与脚本
+        old_handles = list(driver.window_handles)
+        driver.switch_to.new_window("tab")
+        current = driver.current_window_handle
+        for handle in old_handles:
+            if handle != current:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(current)
+        reset_blocking(driver)
+
+    def _ensure_reaper(self):
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = threading.Thread(target=self._reap_idle, name="browser-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_idle(self):
+        interval = max(1, min(self.idle_timeout, 30))
+        while not self._closed:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._cond:
+                expired = [b for b in self._idle if now - b.last_used >= self.idle_timeout]
+                self._idle = [b for b in self._idle if b not in expired]
+                self._total -= len(expired)
+                if expired:
+                    self._cond.notify_all()
+            for browser in expired:
+                logger.info("Recycling idle chrome (uses=%d)", browser.uses)
+                browser.quit()
+
+
+def navigate(driver, url: str):
+    """按资源拦截配置（图片、字体、媒体、广告统计域名）打开页面"""
+    try:
+        apply_blocking(driver, url)
+    except Exception:
+        logger.debug("Failed to apply resource blocking for %s", url, exc_info=True)
+    with phase("page_load"):
+        driver.get(url)
+
+
+def _origin_of(url: str) -> str:
+    parts = urlsplit(url or "")
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return ""
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _process_tree_rss_mb(driver) -> float:
+    """统计 chromedriver 及其全部子进程（Chrome 主进程、渲染进程等）的常驻内存"""
+    try:
+        root_pid = driver.service.process.pid
+        output = subprocess.run(["ps", "-A", "-o", "pid=,ppid=,rss="],
+                                capture_output=True, text=True, timeout=5).stdout
+    except Exception:
+        return 0.0
+    children = {}
+    rss = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) != 3:
+            continue
+        pid, ppid, kb = (int(f) for f in fields)
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = kb
+    total_kb = 0
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        total_kb += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total_kb / 1024
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def warm_on_start() -> bool:
+    return _POOL_WARM_ON_START
+
+
+def get_browser_pool() -> BrowserPool:
+    """进程内共享的浏览器池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
@@ -0,0 +1,269 @@
+import asyncio
+import datetime
+import os
+import platform
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+try:  # Windows 没有 fcntl，只能依赖进程内的锁
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from services.executor import get_executor
+
+_ICS_PATH = os.getenv("CALENDAR_ICS_PATH",
+                      os.path.join(os.path.expanduser("~"), ".local", "share", "mcp_hub", "calendar.ics"))
+
+# 尝试匹配的默认日历/提醒列表名 (适配中英文系统)
+_CALENDAR_NAMES = ("Calendar", "日历", "Work", "工作")
+_REMINDER_LISTS = ("Reminders", "提醒", "Tasks")
+
+
+@dataclass
+class CalendarEvent:
+    title: str
+    start: datetime.datetime
+    end: datetime.datetime
+
+
+@dataclass
+class Reminder:
+    title: str
+    due: datetime.datetime = None
+
+
+def parse_time(value: str, name: str = "time") -> datetime.datetime:
+    """解析 '2026-01-30 08:00:00'（也接受省略秒或 ISO 8601 的 T 分隔）"""
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} 必须是时间字符串，例如 '2026-01-30 08:00:00'")
+    try:
+        return datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        raise ValueError(f"{name} 格式错误: {value!r}，应为 '2026-01-30 08:00:00'") from None
+
+
+def _check_title(title):
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("title 不能为空")
+
+
+def make_event(title: str, start_time: str, end_time: str = None) -> CalendarEvent:
+    _check_title(title)
+    start = parse_time(start_time, "start_time")
+    end = parse_time(end_time, "end_time") if end_time else start + datetime.timedelta(hours=1)
+    if end < start:
+        raise ValueError("end_time 早于 start_time")
+    return CalendarEvent(title, start, end)
+
+
+def make_reminder(title: str, due_date: str = None) -> Reminder:
+    _check_title(title)
+    return Reminder(title, parse_time(due_date, "due_date") if due_date else None)
+
+
+class AppleScriptBackend:
+    """通过 osascript 写入 macOS 日历与提醒事项；一批条目在同一次脚本运行中完成，日历/列表只查找一次"""
+
+    calendar_label = "macOS 日历"
+    reminders_label = "macOS 提醒事项"
+
+    async def add_events(self, events: list) -> list:
+        items = [
+            f'make new event at targetCal with properties {{summary:{_as_string(e.title)}, '
+            f'start date:my mkdate({_as_date(e.start)}), end date:my mkdate({_as_date(e.end)})}}'
+            for e in events
+        ]
+        return await self._run("Calendar", "calendar", _CALENDAR_NAMES, "找不到有效的日历列表，请检查名称", items)
+
+    async def add_reminders(self, reminders: list) -> list:
+        items = []
+        for r in reminders:
+            due = f", remind me date:my mkdate({_as_date(r.due)})" if r.due else ""
+            items.append(f"make new reminder at targetCal with properties {{name:{_as_string(r.title)}{due}}}")
+        return await self._run("Reminders", "list", _REMINDER_LISTS, "找不到提醒事项列表", items)
+
+    async def _run(self, app: str, container: str, names: tuple, not_found: str, items: list) -> list:
+        """每个条目单独 try，失败不影响其余条目；返回与 items 一一对应的 None（成功）或错误信息"""
+        body = "\n".join(f"""
+                try
+                    {item}
+                    set end of results to "ok"
+                on error errMsg
+                    set end of results to "error: " & errMsg
+                end try""" for item in items)
+        script = f'''
+            on mkdate(y, m, d, s)
+                set t to current date
+                set day of t to 1
+                set year of t to y
+                set month of t to m
+                set day of t to d
+                set time of t to s
+                return t
+            end mkdate
+
+            tell application "{app}"
+                set targetCal to missing value
+                repeat with cName in {{{", ".join(_as_string(n) for n in names)}}}
+                    if exists {container} cName then
+                        set targetCal to {container} cName
+                        exit repeat
+                    end if
+                end repeat
+
+                if targetCal is missing value then error "{not_found}"
+
+                set results to {{}}
+                {body}
+                set AppleScript's text item delimiters to linefeed
+                return results as text
+            end tell
+            '''
+        result = await get_executor("calendar").run_subprocess(["osascript", "-e", script])
+        if result.returncode != 0:
+            return [result.stderr.strip() or "osascript 执行失败"] * len(items)
+        lines = result.stdout.strip().split("\n")
+        return [None if line == "ok" else line[len("error: "):] for line in lines[:len(items)]] + \
+            ["未返回结果"] * (len(items) - len(lines))
+
+
+class IcsBackend:
+    """写入本地 iCalendar 文件，不依赖 macOS。
+
+    path 为 .ics 文件时所有条目追加到同一个 VCALENDAR；path 为目录时按 CalDAV/vdir 的布局每个条目单独一个 .ics 文件，
+    可直接被 vdirsyncer 等工具同步。
+    """
+
+    def __init__(self, path: str = _ICS_PATH):
+        self.path = path
+        self.calendar_label = self.reminders_label = f"本地日历 {path}"
+        self._lock = threading.Lock()
+
+    @property
+    def is_directory(self) -> bool:
+        return os.path.isdir(self.path) or self.path.endswith(os.sep)
+
+    async def add_events(self, events: list) -> list:
+        return await asyncio.to_thread(self._write, [_vevent(e) for e in events])
+
+    async def add_reminders(self, reminders: list) -> list:
+        return await asyncio.to_thread(self._write, [_vtodo(r) for r in reminders])
+
+    def _write(self, components: list) -> list:
+        with self._lock:
+            if self.is_directory:
+                os.makedirs(self.path, exist_ok=True)
+                for uid, lines in components:
+                    _atomic_write(os.path.join(self.path, f"{uid}.ics"), _calendar(lines))
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                # 多进程模式（MCP_HUB_WORKERS）下各 worker 会写同一个文件，读-改-写期间持有文件锁，避免互相覆盖
+                with _file_lock(self.path + ".lock"):
+                    existing = ""
+                    if os.path.exists(self.path):
+                        with open(self.path, encoding="utf-8", newline="") as f:
+                            existing = f.read()
+                    new_lines = [line for _, lines in components for line in lines]
+                    if "END:VCALENDAR" in existing:
+                        head, _, _ = existing.rpartition("END:VCALENDAR")
+                        content = head + "".join(_fold(line) for line in new_lines) + "END:VCALENDAR\r\n"
+                    else:
+                        content = _calendar(new_lines)
+                    _atomic_write(self.path, content)
+        return [None] * len(components)
+
+
+def _vevent(event: CalendarEvent):
+    uid = f"{uuid.uuid4()}@mcp-hub"
+    return uid, [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{_utc_now()}",
+        f"DTSTART:{_ics_time(event.start)}",
+        f"DTEND:{_ics_time(event.end)}",
+        f"SUMMARY:{_ics_text(event.title)}",
+        "END:VEVENT",
+    ]
+
+
+def _vtodo(reminder: Reminder):
+    uid = f"{uuid.uuid4()}@mcp-hub"
+    lines = ["BEGIN:VTODO", f"UID:{uid}", f"DTSTAMP:{_utc_now()}", f"SUMMARY:{_ics_text(reminder.title)}"]
+    if reminder.due:
+        lines.append(f"DUE:{_ics_time(reminder.due)}")
+    return uid, lines + ["STATUS:NEEDS-ACTION", "END:VTODO"]
+
+
+def _calendar(lines: list) -> str:
+    return "".join(_fold(line) for line in ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//mcp_hub//calendar//CN",
+                                             *lines, "END:VCALENDAR"])
+
+
+def _fold(line: str) -> str:
+    """RFC 5545：每行不超过 75 字节，续行以空格开头"""
+    data = line.encode("utf-8")
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while cut and (data[cut] & 0xC0) == 0x80:  # 不在多字节字符中间断开
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_text(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_time(value: datetime.datetime) -> str:
+    # 不带时区的本地时间（floating time），与 macOS 日历中按本地时间创建的行为一致
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+@contextmanager
+def _file_lock(path: str):
+    """跨进程的排他锁（flock）"""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _atomic_write(path: str, content: str):
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _as_string(value: str) -> str:
+    """AppleScript 字符串字面量，转义反斜杠与双引号，防止标题中的引号破坏脚本"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _as_date(value: datetime.datetime) -> str:
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return f"{value.year}, {value.month}, {value.day}, {seconds}"
+
+
+def create_backend(name: str = None, ics_path: str = None):
+    """按名称创建后端：applescript / ics；未指定时读取 CALENDAR_BACKEND，默认 macOS 上用 applescript，其余平台用 ics"""
+    name = name or os.getenv("CALENDAR_BACKEND") or ("applescript" if platform.system() == "Darwin" else "ics")
+    if name == "applescript":
+        return AppleScriptBackend()
+    if name == "ics":
+        return IcsBackend(ics_path or _ICS_PATH)
+    raise ValueError(f"Unsupported calendar backend: {name}")
@@ -1,81 +1,89 @@
-import datetime
-import subprocess
 from mcp.server.fastmcp import FastMCP
 
-
-class CalendarService:
-
+from services.calendar_backends import create_backend, make_event, make_reminder
+from services.metrics import report_failure
 
 
+class CalendarService:
+    def __init__(self, backend: str = None, ics_path: str = None):
+        # macOS 上默认写入系统日历（AppleScript），其余平台写入本地 .ics 文件
+        self.backend = create_backend(backend, ics_path)
 
     def register_tools(self, mcp: FastMCP):
-
-        def execute_applescript(script):
-            process = subprocess.Popen(['osascript', '-e', script], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                       text=True)
-            stdout, stderr = process.communicate()
-            return process.returncode == 0, stdout, stderr
+        backend = self.backend
 
         @mcp.tool()
         async def add_calendar_event(title: str, start_time: str, end_time: str = None):
             """
-            添加 macOS 日历事件。start_time 格式: '2026-01-30 08:00:00'
+            添加日历事件。start_time 格式: '2026-01-30 08:00:00'
             """
-            if not end_time:
-                dt = datetime.datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                end_time = (dt + datetime.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-
-            # 尝试匹配 "Calendar" 或 "日历" (适配中英文系统)
-            script = f'''
-            tell application "Calendar"
-                set targetCal to missing value
-                -- 尝试寻找默认日历名
-                set calNames to {{"Calendar", "日历", "Work", "工作"}}
-                repeat with cName in calNames
-                    if exists calendar cName then
-                        set targetCal to calendar cName
-                        exit repeat
-                    end if
-                end repeat
-
-                if targetCal is missing value then error "找不到有效的日历列表，请检查名称"
-
-                set start_date to date "{start_time}"
-                set end_date to date "{end_time}"
-                make new event at targetCal with properties {{summary:"{title}", start date:start_date, end date:end_date}}
-            end tell
-            '''
-            success, out, err = execute_applescript(script)
-            if success:
-                return f"✅ 成功！已在 macOS 日历中添加: {title}"
+            try:
+                event = make_event(title, start_time, end_time)
+            except ValueError as e:
+                return report_failure(f"❌ 失败！参数错误: {e}")
+            err, = await backend.add_events([event])
+            if err is None:
+                return f"✅ 成功！已在 {backend.calendar_label} 中添加: {title}"
             else:
-                return f"❌ 失败！错误信息: {err}"
+                return report_failure(f"❌ 失败！错误信息: {err}")
 
         @mcp.tool()
         async def add_reminder(title: str, due_date: str = None):
             """
-            添加 macOS 提醒事项。due_date 格式: '2026-01-30 08:00:00'
+            添加提醒事项。due_date 格式: '2026-01-30 08:00:00'
             """
-            date_clause = f'remind me date:date "{due_date}"' if due_date else ""
-            # 尝试匹配 "Reminders" 或 "提醒"
-            script = f'''
-            tell application "Reminders"
-                set targetList to missing value
-                set listNames to {{"Reminders", "提醒", "Tasks"}}
-                repeat with lName in listNames
-                    if exists list lName then
-                        set targetList to list lName
-                        exit repeat
-                    end if
-                end repeat
+            try:
+                reminder = make_reminder(title, due_date)
+            except ValueError as e:
+                return report_failure(f"❌ 失败！参数错误: {e}")
+            err, = await backend.add_reminders([reminder])
+            if err is None:
+                return f"🔔 成功！已添加到 {backend.reminders_label}"
+            else:
+                return report_failure(f"❌ 失败！原因: {err}")
 
-                if targetList is missing value then error "找不到提醒事项列表"
+        @mcp.tool()
+        async def add_calendar_events(events: list[dict]):
+            """
+            批量添加日历事件，所有条目在一次写入中完成（macOS 上只启动一次 osascript）。
+            events 示例: [{"title": "航班", "start_time": "2026-01-30 08:00:00", "end_time": "2026-01-30 10:30:00"}]
+            end_time 可省略，默认持续 1 小时。
+            """
+            return await _add_batch(events, lambda e: make_event(e.get("title"), e.get("start_time"), e.get("end_time")),
+                                    backend.add_events, f"已在 {backend.calendar_label} 中添加")
 
-                make new reminder at targetList with properties {{name:"{title}" {"," if due_date else ""} {date_clause}}}
-            end tell
-            '''
-            success, out, err = execute_applescript(script)
-            if success:
-                return f"🔔 成功！已添加到 macOS 提醒事项"
-            else:
-                return f"❌ 失败！原因: {err}"
\ No newline at end of file
+        @mcp.tool()
+        async def add_reminders(reminders: list[dict]):
+            """
+            批量添加提醒事项，所有条目在一次写入中完成。
+            reminders 示例: [{"title": "值机", "due_date": "2026-01-29 20:00:00"}]，due_date 可省略。
+            """
+            return await _add_batch(reminders, lambda r: make_reminder(r.get("title"), r.get("due_date")),
+                                    backend.add_reminders, f"已添加到 {backend.reminders_label}")
+
+
+async def _add_batch(items: list, build, add, done_text: str) -> str:
+    """先校验全部条目，合法的一次性写入后端，按原顺序逐条汇报结果"""
+    errors = {}
+    valid = []
+    for idx, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[idx] = "参数错误: 每个条目必须是对象"
+            continue
+        try:
+            valid.append((idx, build(item)))
+        except (ValueError, TypeError) as e:
+            errors[idx] = f"参数错误: {e}"
+    if valid:
+        for (idx, _), err in zip(valid, await add([entry for _, entry in valid])):
+            if err is not None:
+                errors[idx] = err
+
+    lines = []
+    for idx, item in enumerate(items):
+        title = item.get("title", "") if isinstance(item, dict) else item
+        lines.append(f"{idx + 1}. {'❌ ' + errors[idx] if idx in errors else '✅'} {title}")
+    if errors and len(errors) == len(items):
+        report_failure()  # 全部条目失败才计入失败数
+    summary = f"{done_text} {len(items) - len(errors)}/{len(items)} 条"
+    return summary + "\n" + "\n".join(lines)
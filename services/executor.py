@@ -0,0 +1,192 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import re
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+
+from services.metrics import phase
+
+# 各服务默认的并发上限，可通过 MCP_HUB_EXECUTOR_<NAME>_WORKERS 覆盖
+_DEFAULT_WORKERS = {
+    "web": 4,
+    "git": 4,
+    "git_bulk": 16,
+    "calendar": 2,
+    "math": 2,
+}
+_FALLBACK_WORKERS = int(os.getenv("MCP_HUB_EXECUTOR_DEFAULT_WORKERS", "4"))
+
+
+@dataclass
+class SubprocessResult:
+    args: list
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+class ServiceExecutor:
+    """单个服务专用的执行层：把阻塞调用放到有界线程池/进程池中，避免卡住事件循环。
+
+    - ``run`` 在线程池（或 kind=process 时的进程池）中执行同步函数；
+    - ``run_subprocess`` 用 ``asyncio.create_subprocess_exec`` 异步执行外部命令。
+    两者共享同一个并发上限 ``max_workers``。
+    """
+
+    def __init__(self, name: str, max_workers: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.kind = kind
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def run(self, func, *args, **kwargs):
+        """在线程池/进程池中执行阻塞函数并等待结果"""
+        loop = asyncio.get_running_loop()
+        async with self._acquire():
+            if self.kind == "process":
+                call = functools.partial(func, *args, **kwargs)
+            else:
+                # 线程池里保留调用方的 contextvars（日志、指标等上下文）
+                ctx = contextvars.copy_context()
+                call = functools.partial(ctx.run, func, *args, **kwargs)
+            return await loop.run_in_executor(self._get_pool(), call)
+
+    async def run_subprocess(self, args, cwd: str = None, timeout: float = None,
+                             env: dict = None, on_stderr=None) -> SubprocessResult:
+        """异步执行外部命令；超时或被取消时会杀掉子进程。
+
+        传入 on_stderr 时逐行（按 \\r 或 \\n 分隔）回调 stderr 输出，用于解析 git 等命令的进度，
+        回调可以是普通函数或协程函数。
+        """
+        async with self._acquire(), _async_phase("subprocess"):
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                cwd=cwd,
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(_communicate(process, on_stderr), timeout)
+            except BaseException:
+                _kill(process)
+                await process.wait()
+                raise
+            return SubprocessResult(
+                args=list(args),
+                returncode=process.returncode,
+                stdout=stdout.decode("utf-8", errors="replace"),
+                stderr=stderr.decode("utf-8", errors="replace"),
+            )
+
+    def shutdown(self, wait: bool = False):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+                self._pool = None
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f"mcp-{self.name}")
+            return self._pool
+
+    @contextlib.asynccontextmanager
+    async def _acquire(self):
+        semaphore = self._semaphore()
+        with phase("executor_wait"):
+            await semaphore.acquire()
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # asyncio.Semaphore 绑定事件循环，按循环分别创建
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_workers)
+        return semaphore
+
+
+async def _communicate(process, on_stderr):
+    if on_stderr is None:
+        return await process.communicate()
+    stdout_task = asyncio.ensure_future(process.stdout.read())
+    try:
+        stderr = await _stream_lines(process.stderr, on_stderr)
+        stdout = await stdout_task
+    finally:
+        stdout_task.cancel()
+    await process.wait()
+    return stdout, stderr
+
+
+async def _stream_lines(stream, callback) -> bytes:
+    chunks = []
+    pending = b""
+    while True:
+        data = await stream.read(4096)
+        if not data:
+            break
+        chunks.append(data)
+        *lines, pending = re.split(rb"[\r\n]", pending + data)
+        for line in lines:
+            if line:
+                await _maybe_await(callback(line.decode("utf-8", errors="replace")))
+    if pending:
+        await _maybe_await(callback(pending.decode("utf-8", errors="replace")))
+    return b"".join(chunks)
+
+
+async def _maybe_await(result):
+    if inspect.isawaitable(result):
+        await result
+
+
+@contextlib.asynccontextmanager
+async def _async_phase(name: str):
+    with phase(name):
+        yield
+
+
+def _kill(process):
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ServiceExecutor:
+    """按服务名获取共享执行器。
+
+    并发上限与执行方式读取环境变量 MCP_HUB_EXECUTOR_<NAME>_WORKERS / MCP_HUB_EXECUTOR_<NAME>_KIND
+    (thread 或 process)。
+    """
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            prefix = f"MCP_HUB_EXECUTOR_{name.upper()}"
+            workers = int(os.getenv(f"{prefix}_WORKERS", _DEFAULT_WORKERS.get(name, _FALLBACK_WORKERS)))
+            kind = os.getenv(f"{prefix}_KIND", "thread")
+            executor = _executors[name] = ServiceExecutor(name, workers, kind)
+        return executor
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from services.executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+# 镜像根目录，设为 off 关闭镜像缓存
+_MIRROR_DIR = os.getenv("GIT_MIRROR_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mcp_hub", "git-mirrors"))
+_MIRROR_MAX_BYTES = int(os.getenv("GIT_MIRROR_MAX_BYTES", str(10 * 1024 ** 3)))  # 镜像总大小上限，超出按最近使用淘汰
+_MIRROR_REFRESH = int(os.getenv("GIT_MIRROR_REFRESH", "600"))  # 镜像超过多少秒未更新时在后台刷新
+_MIRROR_TIMEOUT = float(os.getenv("GIT_MIRROR_TIMEOUT", "1800"))  # 创建/刷新镜像的超时
+
+_LAST_USED = "mcp-hub-last-used"
+_LAST_FETCHED = "mcp-hub-last-fetched"
+_SCP_LIKE_RE = re.compile(r"^(?:(?P<user>[^@/]+)@)?(?P<host>[^:/]+):(?P<path>[^/].*)$")
+# 镜像只保存分支与标签；clone --mirror 会连同 refs/pull/* 等所有命名空间一起下载，首次克隆大仓库时多出很多数据
+_MIRROR_REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+# 禁止交互式输入账号密码，后台刷新不能卡住
+_GIT_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+
+
+def normalize_url(url: str) -> str:
+    """镜像键：统一 scp 风格地址、小写主机名、去掉末尾的 / 与 .git，使同一仓库的不同写法命中同一镜像"""
+    url = url.strip()
+    match = _SCP_LIKE_RE.match(url)
+    if match and "://" not in url:
+        user = f"{match.group('user')}@" if match.group("user") else ""
+        url = f"ssh://{user}{match.group('host')}/{match.group('path')}"
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-4]
+    if parts.scheme in ("http", "https", "ssh", "git"):
+        # 只有远程地址的主机名不区分大小写；http(s) 的账号信息不参与键
+        netloc = parts.netloc.lower()
+        if parts.scheme in ("http", "https"):
+            netloc = netloc.rsplit("@", 1)[-1]
+        return urlunsplit((parts.scheme, netloc, path, "", ""))
+    return urlunsplit((parts.scheme, parts.netloc, path, "", "")) if parts.scheme else path
+
+
+class MirrorCache:
+    """本地裸镜像缓存：按规范化 URL 保存远端分支与标签的裸仓库，克隆时用 ``--reference --dissociate`` 复用其中的对象。
+
+    镜像过期后在后台 ``git remote update`` 刷新；总大小超过上限时按最近使用时间淘汰。
+    """
+
+    def __init__(self, root: str = _MIRROR_DIR, max_bytes: int = _MIRROR_MAX_BYTES,
+                 refresh_interval: int = _MIRROR_REFRESH):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.refresh_interval = refresh_interval
+        self._locks = {}
+        self._in_use = {}
+        self._refreshing = set()
+        self._creating = set()
+        self._background = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root) and self.root.lower() != "off"
+
+    def path_for(self, url: str) -> str:
+        normalized = normalize_url(url)
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", normalized.rsplit("/", 1)[-1])[:40] or "repo"
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.root, f"{name}-{digest}.git")
+
+    async def acquire(self, url: str, create: bool = True, on_progress=None):
+        """返回可作为 --reference 的镜像路径（不可用时返回 None），用完需调用 release。
+
+        镜像不存在且 create=True 时先同步创建，on_progress 逐行接收 ``git fetch --progress`` 的输出；
+        已存在但过期时直接使用并在后台刷新。
+        """
+        if not self.enabled:
+            return None
+        path = self.path_for(url)
+        async with self._lock(path):
+            if not os.path.isdir(path):
+                if not create or not await self._create(url, path, on_progress):
+                    return None
+            elif self._is_stale(path):
+                self._refresh_in_background(path)
+            self._in_use[path] = self._in_use.get(path, 0) + 1
+            _touch(os.path.join(path, _LAST_USED))
+        return path
+
+    def release(self, path: str):
+        if path is None:
+            return
+        self._in_use[path] -= 1
+        if not self._in_use[path]:
+            del self._in_use[path]
+        self._spawn(self.evict())
+
+    async def evict(self):
+        """清理中断创建留下的临时目录；总大小超过上限时，从最久未使用的镜像开始删除（正在被克隆引用的镜像除外）"""
+        if not self.enabled or not os.path.isdir(self.root):
+            return
+        mirrors, stale = await asyncio.to_thread(self._scan)
+        for tmp_path in stale:
+            logger.info("Removing stale git mirror temp dir %s", tmp_path)
+            await asyncio.to_thread(shutil.rmtree, tmp_path, True)
+        total = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            # 持有与 acquire 相同的锁再确认一次，避免刚被借出的镜像在克隆过程中被删除
+            async with self._lock(path):
+                if path in self._in_use or path in self._refreshing or not os.path.isdir(path):
+                    continue
+                logger.info("Evicting git mirror %s (%d bytes)", path, size)
+                await asyncio.to_thread(shutil.rmtree, path, True)
+            total -= size
+
+    def _scan(self):
+        """返回 ([(最近使用时间, 路径, 大小)], [可删除的临时目录])"""
+        mirrors, stale = [], []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            if entry.name.endswith(".git"):
+                mirrors.append((_mtime(os.path.join(entry.path, _LAST_USED)), entry.path, _dir_size(entry.path)))
+            elif ".git.tmp-" in entry.name and entry.path not in self._creating and _is_stale_tmp(entry.path):
+                stale.append(entry.path)
+        return mirrors, stale
+
+    async def _create(self, url: str, path: str, on_progress=None) -> bool:
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        self._creating.add(tmp_path)
+        executor = get_executor("git")
+        try:
+            # 裸仓库 + 只取分支与标签的 refspec，之后的 remote update 沿用同样的 refspec
+            setup = [["git", "init", "--bare", "--quiet", tmp_path],
+                     ["git", "-C", tmp_path, "config", "remote.origin.url", url]]
+            setup += [["git", "-C", tmp_path, "config", "--add", "remote.origin.fetch", refspec]
+                      for refspec in _MIRROR_REFSPECS]
+            for args in setup:
+                result = await executor.run_subprocess(args)
+                if result.returncode != 0:
+                    logger.warning("Failed to create git mirror for %s: %s", url, result.stderr.strip())
+                    return False
+            result = await executor.run_subprocess(
+                ["git", "fetch", "--progress", "--prune", "origin"],
+                cwd=tmp_path, timeout=_MIRROR_TIMEOUT, env=_GIT_ENV, on_stderr=on_progress)
+            if result.returncode != 0:
+                logger.warning("Failed to create git mirror for %s: %s", url, result.stderr.strip())
+                return False
+            os.replace(tmp_path, path)
+            _touch(os.path.join(path, _LAST_FETCHED))
+            return True
+        except Exception as e:
+            logger.warning("Failed to create git mirror for %s: %s", url, e)
+            return False
+        finally:
+            # 截止时间或客户端断开引发的 CancelledError 也要清理，否则临时目录会一直留在镜像目录里
+            self._creating.discard(tmp_path)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _is_stale(self, path: str) -> bool:
+        return time.time() - _mtime(os.path.join(path, _LAST_FETCHED)) >= self.refresh_interval
+
+    def _refresh_in_background(self, path: str):
+        if path in self._refreshing:
+            return
+        self._refreshing.add(path)
+        self._spawn(self._refresh(path))
+
+    async def _refresh(self, path: str):
+        try:
+            result = await get_executor("git").run_subprocess(
+                ["git", "remote", "update", "--prune"], cwd=path, timeout=_MIRROR_TIMEOUT, env=_GIT_ENV)
+            if result.returncode == 0:
+                _touch(os.path.join(path, _LAST_FETCHED))
+            else:
+                logger.warning("Failed to refresh git mirror %s: %s", path, result.stderr.strip())
+        except Exception as e:
+            logger.warning("Failed to refresh git mirror %s: %s", path, e)
+        finally:
+            self._refreshing.discard(path)
+
+    def _spawn(self, coro):
+        # 后台任务与调用方解耦：保存引用防止被回收，且不受调用方截止时间取消的影响
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _lock(self, path: str) -> asyncio.Lock:
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks[path] = asyncio.Lock()
+        return lock
+
+
+def _touch(path: str):
+    with open(path, "a"):
+        os.utime(path)
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _is_stale_tmp(path: str) -> bool:
+    """创建镜像的进程已经退出，或临时目录超过创建超时仍未完成（本进程正在创建的目录由调用方排除）"""
+    try:
+        pid = int(path.rsplit(".tmp-", 1)[1])
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return time.time() - _mtime(path) >= _MIRROR_TIMEOUT
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+_mirrors = None
+
+
+def get_mirror_cache() -> MirrorCache:
+    """进程内共享的镜像缓存"""
+    global _mirrors
+    if _mirrors is None:
+        _mirrors = MirrorCache()
+    return _mirrors
@@ -1,6 +1,34 @@
-import subprocess
+import asyncio
+import fnmatch
+import json
 import os
-from mcp.server.fastmcp import FastMCP
+import re
+import time
+from mcp.server.fastmcp import Context, FastMCP
+
+from services.executor import get_executor
+from services.git_mirror import get_mirror_cache
+from services.git_state import get_repo_state_cache
+from services.metrics import report_failure
+
+# git clone --progress 的阶段进度，例如 "Receiving objects:  45% (450/1000), 1.20 MiB | 2.40 MiB/s"
+_CLONE_PROGRESS_RE = re.compile(r"(Receiving objects|Resolving deltas):\s+(\d+)%")
+# 各阶段在整体进度（0-100）中的区间
+_CLONE_STAGES = {"Receiving objects": (0, 90), "Resolving deltas": (90, 100)}
+_PROGRESS_LINE_RE = re.compile(r"^(remote: )?[\w ]+:\s+\d+% \(")
+_CLONE_FILTER_RE = re.compile(r"^(blob:none|blob:limit=\d+[kmg]?|tree:\d+)$")
+
+_BULK_WORKERS = int(os.getenv("GIT_BULK_WORKERS", "8"))  # git_bulk 默认并行数
+_BULK_TIMEOUT = float(os.getenv("GIT_BULK_TIMEOUT", "60"))  # 单个仓库的超时（秒）
+_BULK_MAX_DEPTH = int(os.getenv("GIT_BULK_MAX_DEPTH", "2"))  # 在 workspace 下查找仓库的目录深度
+_BULK_COMMANDS = {
+    "status": ["git", "status", "--porcelain", "--branch"],
+    "fetch": ["git", "fetch", "--prune", "--quiet"],
+    "pull": ["git", "pull", "--ff-only", "--quiet"],
+    "log": ["git", "log", "--oneline", "-n", "5"],
+}
+# 批量操作时禁止 git 弹出账号密码提示，避免某个仓库卡住直到超时
+_BULK_ENV = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
 
 
 class GitService:
@@ -9,34 +37,74 @@ class GitService:
         self.default_workspace = os.path.abspath(default_workspace)
 
     def register_tools(self, mcp: FastMCP):
+        # git 命令通过 asyncio 子进程执行，不再阻塞事件循环
+        executor = get_executor("git")
+        # 批量操作使用独立的执行器，避免一次扫描占满单仓库操作的并发名额
+        bulk_executor = get_executor("git_bulk")
+
         @mcp.tool(name="git_clone")
-        async def git_clone(repo_url: str, folder_name: str, workspace_path: str = None) -> str:
+        async def git_clone(repo_url: str, folder_name: str, workspace_path: str = None, depth: int = None,
+                            filter: str = None, single_branch: bool = False, use_mirror: bool = True,
+                            ctx: Context = None) -> str:
             """
-            克隆远程仓库到本地。
+            克隆远程仓库到本地，克隆过程中通过 MCP progress 通知汇报进度。
+            同一仓库再次克隆时复用本地镜像缓存中的对象，只从远端拉取增量。
             :param repo_url: 仓库地址 (HTTPS 或 SSH)
             :param folder_name: 本地保存的文件夹名称
             :param workspace_path: (可选) 克隆到的目标根目录，如果不提供则使用默认路径
+            :param depth: (可选) 浅克隆的提交深度
+            :param filter: (可选) 部分克隆过滤条件，如 blob:none（按需下载文件内容）
+            :param single_branch: 只克隆默认分支
+            :param use_mirror: 是否使用本地镜像缓存
             """
             # 逻辑：如果 client 传了路径就用 client 的，否则用初始化的默认路径
             root = os.path.abspath(workspace_path) if workspace_path else self.default_workspace
 
+            if depth is not None and depth < 1:
+                return report_failure("参数错误：depth 必须是正整数。")
+            if filter and not _CLONE_FILTER_RE.match(filter):
+                return report_failure("参数错误：filter 只支持 blob:none、blob:limit=<大小>、tree:<深度>。")
+
             if not os.path.exists(root):
                 os.makedirs(root)
 
             target_path = os.path.join(root, folder_name)
             if os.path.exists(target_path):
-                return f"错误：目录 {target_path} 已存在。"
+                return report_failure(f"错误：目录 {target_path} 已存在。")
 
+            cmd = ["git", "clone", "--progress"]
+            if depth:
+                cmd += ["--depth", str(depth)]
+            if filter:
+                cmd += [f"--filter={filter}"]
+            if single_branch:
+                cmd += ["--single-branch"]
+
+            mirrors = get_mirror_cache()
+            mirror = None
+            progress = _CloneProgress(ctx)
             try:
-                result = subprocess.run(
-                    ["git", "clone", repo_url, folder_name],
+                if use_mirror:
+                    # 浅克隆/部分克隆本意是少下载，不为它们首次创建完整镜像，只复用已有镜像；
+                    # 首次创建镜像是最耗时的一步，占整体进度的前 80%
+                    mirror = await mirrors.acquire(repo_url, create=not (depth or filter),
+                                                   on_progress=progress.stage(80, "创建镜像: "))
+                if mirror:
+                    cmd += ["--reference-if-able", mirror, "--dissociate"]
+                result = await executor.run_subprocess(
+                    cmd + ["--", repo_url, folder_name],
                     cwd=root,
-                    capture_output=True,
-                    text=True
+                    on_stderr=progress.stage(99),
                 )
-                return f"成功克隆至 {target_path}" if result.returncode == 0 else f"失败: {result.stderr}"
+                if result.returncode == 0:
+                    await progress.done("克隆完成")
+                if result.returncode != 0:
+                    return report_failure(f"失败: {_strip_progress(result.stderr)}")
+                return f"成功克隆至 {target_path}" + ("（使用本地镜像）" if mirror else "")
             except Exception as e:
-                return f"异常: {str(e)}"
+                return report_failure(f"异常: {str(e)}")
+            finally:
+                mirrors.release(mirror)
 
         @mcp.tool(name="git_manage")
         async def git_manage(repo_path: str, action: str, message: str = "", branch: str = "main") -> str:
@@ -54,7 +122,7 @@ class GitService:
                 full_path = os.path.join(self.default_workspace, repo_path)
 
             if not os.path.exists(full_path):
-                return f"错误：未找到路径 {full_path}"
+                return report_failure(f"错误：未找到路径 {full_path}")
 
             commands = {
                 "status": ["git", "status"],
@@ -66,16 +134,175 @@ class GitService:
             }
 
             if action not in commands:
-                return f"不支持的操作: {action}"
+                return report_failure(f"不支持的操作: {action}")
 
             try:
-                result = subprocess.run(
+                result = await executor.run_subprocess(
                     commands[action],
                     cwd=full_path,
-                    capture_output=True,
-                    text=True
                 )
-                output = result.stdout if result.returncode == 0 else result.stderr
-                return f"[{action.upper()}] 结果:\n{output}"
+                if result.returncode != 0:
+                    return report_failure(f"[{action.upper()}] 结果:\n{result.stderr}")
+                return f"[{action.upper()}] 结果:\n{result.stdout}"
             except Exception as e:
-                return f"执行异常: {str(e)}"
\ No newline at end of file
+                return report_failure(f"执行异常: {str(e)}")
+
+        @mcp.tool(name="git_repo_state")
+        async def git_repo_state(repo_path: str, log_count: int = 5, refresh: bool = False) -> str:
+            """
+            以 JSON 返回仓库状态：分支、上游、ahead/behind、变更文件与最近的提交。
+            仓库未变化时直接返回内存中的结果，适合频繁轮询。
+            :param repo_path: 仓库的绝对路径或文件夹名（如果是文件夹名，将从默认 workspace 寻找）
+            :param log_count: 返回的最近提交数
+            :param refresh: 忽略缓存，强制重新读取
+            """
+            full_path = repo_path if os.path.isabs(repo_path) else os.path.join(self.default_workspace, repo_path)
+            if not os.path.exists(full_path):
+                return report_failure(f"错误：未找到路径 {full_path}")
+            try:
+                state = await executor.run(get_repo_state_cache().state, full_path, max(0, log_count), refresh)
+                return json.dumps(state, ensure_ascii=False)
+            except Exception as e:
+                return report_failure(f"执行异常: {str(e)}")
+
+        @mcp.tool(name="git_bulk")
+        async def git_bulk(action: str, pattern: str = "*", workspace_path: str = None,
+                           workers: int = None, timeout: float = None) -> str:
+            """
+            对 workspace 下的多个 Git 仓库并行执行同一操作，返回 JSON 汇总（每个仓库的结果、错误与耗时）。
+            :param action: status / fetch / pull / log（pull 只做 fast-forward）
+            :param pattern: 仓库相对路径的通配符，例如 "backend-*" 或 "team/*"，默认全部
+            :param workspace_path: (可选) 扫描的根目录，默认使用初始化时的 workspace
+            :param workers: (可选) 并行数，默认 GIT_BULK_WORKERS
+            :param timeout: (可选) 单个仓库的超时秒数，默认 GIT_BULK_TIMEOUT
+            """
+            if action not in _BULK_COMMANDS:
+                return report_failure(f"不支持的操作: {action}，可选 {'/'.join(_BULK_COMMANDS)}")
+            root = os.path.abspath(workspace_path) if workspace_path else self.default_workspace
+            if not os.path.isdir(root):
+                return report_failure(f"错误：未找到路径 {root}")
+
+            started = time.monotonic()
+            repos = [repo for repo in await asyncio.to_thread(discover_repos, root)
+                     if fnmatch.fnmatch(os.path.relpath(repo, root), pattern)]
+            semaphore = asyncio.Semaphore(max(1, workers or _BULK_WORKERS))
+            timeout = timeout or _BULK_TIMEOUT
+
+            async def run(repo):
+                async with semaphore:
+                    return await _run_bulk_action(bulk_executor, repo, root, action, timeout)
+
+            results = await asyncio.gather(*[run(repo) for repo in repos])
+            failed = sum(1 for r in results if not r["ok"])
+            if failed and failed == len(results):
+                # 部分仓库失败仍算调用成功，全部失败才计入失败数
+                report_failure()
+            return json.dumps({
+                "action": action,
+                "workspace": root,
+                "repos": len(results),
+                "ok": len(results) - failed,
+                "failed": failed,
+                "duration_ms": round((time.monotonic() - started) * 1000),
+                "results": results,
+            }, ensure_ascii=False)
+
+
+def discover_repos(root: str, max_depth: int = None) -> list:
+    """扫描 root 下 max_depth 层以内的 Git 仓库（含 .git 的目录），不进入仓库内部与隐藏目录"""
+    max_depth = _BULK_MAX_DEPTH if max_depth is None else max_depth
+    repos = []
+    stack = [(root, 0)]
+    while stack:
+        path, depth = stack.pop()
+        if os.path.exists(os.path.join(path, ".git")):
+            repos.append(path)
+            continue
+        if depth >= max_depth:
+            continue
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False) and not entry.name.startswith("."):
+                    stack.append((entry.path, depth + 1))
+    return sorted(repos)
+
+
+async def _run_bulk_action(executor, repo: str, root: str, action: str, timeout: float) -> dict:
+    started = time.monotonic()
+    summary = {"repo": os.path.relpath(repo, root), "ok": False, "result": None, "error": None}
+    try:
+        result = await executor.run_subprocess(_BULK_COMMANDS[action], cwd=repo, timeout=timeout, env=_BULK_ENV)
+        if result.returncode == 0:
+            summary["ok"] = True
+            summary["result"] = _summarize_status(result.stdout) if action == "status" else \
+                _tail(result.stdout or result.stderr)
+        else:
+            summary["error"] = _tail(result.stderr or result.stdout)
+    except asyncio.TimeoutError:
+        summary["error"] = f"超时（{timeout:g}s）"
+    except Exception as e:
+        summary["error"] = str(e)
+    summary["duration_ms"] = round((time.monotonic() - started) * 1000)
+    return summary
+
+
+def _summarize_status(output: str) -> dict:
+    """把 status --porcelain --branch 的输出压缩成 分支/跟踪信息 + 各类变更计数"""
+    lines = output.splitlines()
+    branch = lines[0][3:] if lines and lines[0].startswith("## ") else ""
+    changes = [line for line in lines if not line.startswith("## ")]
+    return {
+        "branch": branch,
+        "clean": not changes,
+        "staged": sum(1 for line in changes if line[0] not in " ?"),
+        "modified": sum(1 for line in changes if len(line) > 1 and line[1] not in " ?"),
+        "untracked": sum(1 for line in changes if line.startswith("??")),
+    }
+
+
+def _tail(output: str, max_lines: int = 5, max_chars: int = 500) -> str:
+    lines = [line for line in output.strip().splitlines() if line.strip()]
+    return "\n".join(lines[-max_lines:])[-max_chars:]
+
+
+def _strip_progress(stderr: str) -> str:
+    """去掉 --progress 产生的大量进度刷新行，只保留真正的提示与错误信息"""
+    lines = re.split(r"[\r\n]", stderr)
+    return "\n".join(line for line in lines if line.strip() and not _PROGRESS_LINE_RE.match(line))
+
+
+class _CloneProgress:
+    """把一次克隆中各个 git 命令（创建镜像的 fetch、clone）的 --progress 输出合成单调递增的 MCP 进度通知"""
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+        self.last = -1
+
+    def stage(self, end: int, label: str = ""):
+        """返回 on_stderr 回调：把该命令自身 0-100% 的进度映射到 [当前进度, end]"""
+        if self.ctx is None:
+            return None
+        start = self.last + 1
+
+        async def report(line: str):
+            match = _CLONE_PROGRESS_RE.search(line)
+            if not match:
+                return
+            stage_start, stage_end = _CLONE_STAGES[match.group(1)]
+            percent = stage_start + (stage_end - stage_start) * int(match.group(2)) // 100
+            progress = start + (end - start) * percent // 100
+            if progress <= self.last:
+                return
+            self.last = progress
+            await self.ctx.report_progress(progress, 100, label + line.strip())
+
+        return report
+
+    async def done(self, message: str):
+        if self.ctx is not None and self.last < 100:
+            self.last = 100
+            await self.ctx.report_progress(100, 100, message)
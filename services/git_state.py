@@ -0,0 +1,278 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+# 工作区文件修改不会改动 .git 元数据，缓存最多沿用这么多秒，超过后重新执行一次 git status
+_STATE_MAX_AGE = float(os.getenv("GIT_STATE_MAX_AGE", "10"))
+_STATE_MAX_REPOS = int(os.getenv("GIT_STATE_MAX_REPOS", "64"))  # 缓存状态并保留 cat-file 进程的仓库数
+_STATE_MAX_FILES = int(os.getenv("GIT_STATE_MAX_FILES", "200"))  # 返回的变更文件数上限
+_STATUS_TIMEOUT = float(os.getenv("GIT_STATE_STATUS_TIMEOUT", "30"))
+_COMMIT_CACHE_SIZE = 4096  # 提交对象不可变，按 sha 缓存解析结果
+
+# status 不写回 index，否则每次查询都会刷新 index 的 mtime，使基于 mtime 的缓存失效
+_STATUS_CMD = ["git", "--no-optional-locks", "status", "--porcelain=v2", "--branch", "-z"]
+
+
+class _CatFile:
+    """常驻的 ``git cat-file --batch`` 进程，按需读取对象，避免每次查询都启动 git"""
+
+    def __init__(self, repo: str):
+        self.repo = repo
+        self._process = None
+        self._lock = threading.Lock()
+
+    def read(self, name: str):
+        """返回 (sha, 类型, 内容)，对象不存在时返回 None"""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    return self._read(name)
+                except (OSError, ValueError):
+                    # 进程意外退出（例如仓库被 gc 或删除）时重启一次
+                    self._close()
+                    if attempt:
+                        raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _read(self, name: str):
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(["git", "cat-file", "--batch"], cwd=self.repo, stdin=subprocess.PIPE,
+                                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._process.stdin.write(name.encode("utf-8") + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline()
+        if not header:
+            raise ValueError("git cat-file exited")
+        fields = header.split()
+        if len(fields) != 3:
+            return None  # "<name> missing" 或 "<name> ambiguous"
+        sha, kind, size = fields
+        data = self._process.stdout.read(int(size))
+        self._process.stdout.read(1)  # 对象内容后的换行
+        return sha.decode(), kind.decode(), data
+
+    def _close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=1)
+            except Exception:
+                self._process.kill()
+            self._process = None
+
+
+class _RepoEntry:
+    def __init__(self, repo: str, git_dir: str):
+        self.repo = repo
+        self.git_dir = git_dir
+        self.cat_file = _CatFile(repo)
+        self.fingerprint = None
+        self.status = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+class RepoStateCache:
+    """结构化的仓库状态（分支、ahead/behind、变更文件、最近提交）。
+
+    状态按 .git 下 HEAD、index、packed-refs 与 refs 的 mtime 指纹缓存，指纹未变且未超过 max_age
+    时直接从内存返回；提交记录通过常驻的 cat-file 进程读取，并按 sha 缓存。
+    """
+
+    def __init__(self, max_age: float = _STATE_MAX_AGE, max_repos: int = _STATE_MAX_REPOS):
+        self.max_age = max_age
+        self.max_repos = max_repos
+        self._repos = OrderedDict()
+        self._commits = OrderedDict()
+        self._lock = threading.Lock()
+
+    def state(self, repo: str, log_count: int = 5, refresh: bool = False) -> dict:
+        entry = self._entry(os.path.abspath(repo))
+        with entry.lock:
+            fingerprint = _fingerprint(entry.repo, entry.git_dir)
+            cached = (not refresh and entry.status is not None and fingerprint == entry.fingerprint
+                      and time.monotonic() - entry.checked_at < self.max_age)
+            if not cached:
+                entry.status = _read_status(entry.repo)
+                entry.fingerprint = fingerprint
+                entry.checked_at = time.monotonic()
+            status = entry.status
+            commits = self._log(entry, status["head"], log_count)
+        return {**status, "commits": commits, "cached": cached}
+
+    def close(self):
+        with self._lock:
+            entries, self._repos = list(self._repos.values()), OrderedDict()
+        for entry in entries:
+            entry.cat_file.close()
+
+    def _entry(self, repo: str) -> _RepoEntry:
+        git_dir = _git_dir(repo)
+        if git_dir is None:
+            raise ValueError(f"不是 Git 仓库: {repo}")
+        evicted = []
+        with self._lock:
+            entry = self._repos.get(repo)
+            if entry is None or entry.git_dir != git_dir:
+                entry = self._repos[repo] = _RepoEntry(repo, git_dir)
+            self._repos.move_to_end(repo)
+            while len(self._repos) > self.max_repos:
+                evicted.append(self._repos.popitem(last=False)[1])
+        for old in evicted:
+            old.cat_file.close()
+        return entry
+
+    def _log(self, entry: _RepoEntry, head: str, count: int) -> list:
+        commits = []
+        sha = head
+        while sha and len(commits) < count:
+            commit = self._commit(entry, sha)
+            if commit is None:
+                break
+            commits.append({key: commit[key] for key in ("sha", "author", "date", "subject")})
+            sha = commit["parents"][0] if commit["parents"] else None
+        return commits
+
+    def _commit(self, entry: _RepoEntry, sha: str):
+        with self._lock:
+            commit = self._commits.get(sha)
+            if commit is not None:
+                self._commits.move_to_end(sha)
+                return commit
+        obj = entry.cat_file.read(sha)
+        if obj is None or obj[1] != "commit":
+            return None
+        commit = _parse_commit(obj[0], obj[2])
+        with self._lock:
+            self._commits[sha] = commit
+            while len(self._commits) > _COMMIT_CACHE_SIZE:
+                self._commits.popitem(last=False)
+        return commit
+
+
+def _git_dir(repo: str):
+    path = os.path.join(repo, ".git")
+    if os.path.isdir(path):
+        return path
+    if os.path.isfile(path):
+        # worktree / submodule：.git 是一个指向真实目录的文件
+        with open(path, encoding="utf-8") as f:
+            content = f.read().strip()
+        if content.startswith("gitdir:"):
+            return os.path.normpath(os.path.join(repo, content[len("gitdir:"):].strip()))
+    return None
+
+
+def _fingerprint(repo: str, git_dir: str) -> tuple:
+    """能反映提交、暂存、分支与远程分支变化的 mtime 指纹；工作区根目录的 mtime 用于捕获新增/删除的文件"""
+    paths = [repo] + [os.path.join(git_dir, name) for name in ("HEAD", "index", "packed-refs")]
+    for refs in ("refs/heads", "refs/remotes"):
+        for dirpath, _, filenames in os.walk(os.path.join(git_dir, refs)):
+            paths.append(dirpath)
+            paths.extend(os.path.join(dirpath, name) for name in filenames)
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((path, st.st_mtime_ns, st.st_size))
+        except OSError:
+            stats.append((path, None, None))
+    return tuple(stats)
+
+
+def _read_status(repo: str) -> dict:
+    result = subprocess.run(_STATUS_CMD, cwd=repo, capture_output=True, timeout=_STATUS_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", errors="replace").strip())
+    return _parse_status(result.stdout.decode("utf-8", errors="replace"))
+
+
+def _parse_status(output: str) -> dict:
+    """解析 ``status --porcelain=v2 --branch -z`` 的输出"""
+    status = {"branch": None, "head": None, "upstream": None, "ahead": 0, "behind": 0}
+    changes = []
+    records = output.split("\0")
+    i = 0
+    while i < len(records):
+        record = records[i]
+        i += 1
+        if not record:
+            continue
+        if record.startswith("# "):
+            key, _, value = record[2:].partition(" ")
+            if key == "branch.oid":
+                status["head"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                status["branch"] = None if value == "(detached)" else value
+            elif key == "branch.upstream":
+                status["upstream"] = value
+            elif key == "branch.ab":
+                ahead, behind = value.split()
+                status["ahead"], status["behind"] = int(ahead), -int(behind)
+        elif record[0] == "1":
+            fields = record.split(" ", 8)
+            changes.append({"path": fields[8], "status": fields[1]})
+        elif record[0] == "2":
+            # 重命名/复制：原路径是紧跟的下一条记录
+            fields = record.split(" ", 9)
+            changes.append({"path": fields[9], "status": fields[1], "orig_path": records[i]})
+            i += 1
+        elif record[0] == "u":
+            fields = record.split(" ", 10)
+            changes.append({"path": fields[10], "status": fields[1], "conflict": True})
+        elif record[0] in "?!":
+            changes.append({"path": record[2:], "status": "??" if record[0] == "?" else "!!"})
+    status["clean"] = not changes
+    status["changed"] = len(changes)
+    status["changes"] = changes[:_STATE_MAX_FILES]
+    status["truncated"] = len(changes) > _STATE_MAX_FILES
+    return status
+
+
+def _parse_commit(sha: str, data: bytes) -> dict:
+    header, _, message = data.decode("utf-8", errors="replace").partition("\n\n")
+    parents = []
+    author, date = "", None
+    for line in header.splitlines():
+        key, _, value = line.partition(" ")
+        if key == "parent":
+            parents.append(value)
+        elif key == "author":
+            author, date = _parse_signature(value)
+    return {"sha": sha, "parents": parents, "author": author, "date": date,
+            "subject": message.strip().split("\n", 1)[0]}
+
+
+def _parse_signature(value: str):
+    """"Name <email> 1700000000 +0800" -> ("Name <email>", ISO 8601 时间)"""
+    ident, _, rest = value.rpartition("> ")
+    try:
+        seconds, offset = rest.split()
+        sign = -1 if offset.startswith("-") else 1
+        tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+        date = datetime.fromtimestamp(int(seconds), tz).isoformat()
+    except ValueError:
+        date = None
+    return ident + ">", date
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_repo_state_cache() -> RepoStateCache:
+    """进程内共享的仓库状态缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RepoStateCache()
+        return _cache
@@ -0,0 +1,234 @@
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.metrics import phase
+
+_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+
+_HTTP_TIMEOUT = float(os.getenv("WEB_SEARCH_HTTP_TIMEOUT", "10"))
+_HTTP_MAX_BYTES = int(os.getenv("WEB_SEARCH_HTTP_MAX_BYTES", str(5 * 1024 * 1024)))  # 单页最多读取 5 MB
+_HTTP_MAX_CONNECTIONS = int(os.getenv("WEB_SEARCH_HTTP_MAX_CONNECTIONS", "50"))
+_HTTP_MIN_TEXT = int(os.getenv("WEB_SEARCH_HTTP_MIN_TEXT", "200"))  # 正文少于该字符数时视为需要 JS 渲染
+# 已知依赖 JavaScript 渲染的站点，auto 模式下直接走浏览器
+_JS_DOMAINS = [
+    d.strip().lower()
+    for d in os.getenv(
+        "WEB_SEARCH_JS_DOMAINS",
+        "toutiao.com,weibo.com,douyin.com,bilibili.com,zhihu.com,x.com,twitter.com,instagram.com,facebook.com",
+    ).split(",")
+    if d.strip()
+]
+
+FETCH_MODES = ("auto", "http", "browser")
+
+_SKIP_TAGS = {"script", "style", "template", "svg", "title", "noscript", "iframe", "canvas"}
+_BLOCK_TAGS = {
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "figcaption", "figure",
+    "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "tr", "ul",
+}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# 正文模式下剔除的区块
+_BOILERPLATE_TAGS = {"nav", "footer", "header", "aside", "form"}
+_BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "complementary"}
+_MAIN_TAGS = {"article", "main"}
+_MAIN_MIN_TEXT = 200
+_NOISE_RE = re.compile(
+    r"[\s_-](?:ads?|advert\w*|banner|sponsor\w*|promo\w*|cookie\w*|share|social|related|recommend\w*|"
+    r"comments?|sidebar|footer|nav\w*|menu|breadcrumbs?|popup|modal)[\s_-]",
+    re.I,
+)
+_TEXT_CONTENT_TYPES = ("text/", "application/xhtml", "application/json", "application/xml")
+_SPA_SHELL_RE = re.compile(r"<div[^>]+id=[\"'](?:root|app|__nuxt|__next)[\"'][^>]*>\s*</div>", re.I)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([\w-]+)", re.I)
+_JS_WALL_RE = re.compile(r"javascript|启用|開啟|开启", re.I)
+
+
+@dataclass
+class HttpPage:
+    url: str
+    status: int
+    content_type: str
+    html: str
+    text: str
+    noscript_text: str
+
+
+class _TextExtractor(HTMLParser):
+    """把 HTML 转成近似 body.innerText 的纯文本；main_content=True 时剔除导航、页脚、广告等区块"""
+
+    def __init__(self, main_content: bool = False):
+        super().__init__(convert_charrefs=True)
+        self._main_content = main_content
+        self._skip_depth = 0
+        self._in_noscript = False
+        self._drop = None  # 正在剔除的区块 [标签, 同名标签嵌套深度]
+        self._main = None  # 正在读取的 article/main 区块 [标签, 同名标签嵌套深度]
+        self._parts = []
+        self._main_parts = []
+        self._noscript = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "noscript":
+            self._in_noscript = True
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+        if self._main_content and tag not in _VOID_TAGS:
+            self._enter_block(tag, dict(attrs))
+        if tag in _BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_endtag(self, tag):
+        if tag == "noscript":
+            self._in_noscript = False
+        if tag in _SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        if tag in _BLOCK_TAGS:
+            self._append("\n")
+        if self._main_content:
+            self._drop = _leave(self._drop, tag)
+            self._main = _leave(self._main, tag)
+
+    def handle_data(self, data):
+        if self._in_noscript:
+            self._noscript.append(data)
+        if not self._skip_depth and self._drop is None:
+            self._append(data)
+
+    def text(self) -> str:
+        main_text = _join_lines(self._main_parts)
+        if len(main_text) > _MAIN_MIN_TEXT:
+            return main_text
+        return _join_lines(self._parts)
+
+    def noscript_text(self) -> str:
+        return " ".join(" ".join(self._noscript).split())
+
+    def _enter_block(self, tag, attrs):
+        if self._drop is not None:
+            if tag == self._drop[0]:
+                self._drop[1] += 1
+            return
+        is_main = tag in _MAIN_TAGS or attrs.get("role") == "main"
+        if self._main is not None:
+            if tag == self._main[0]:
+                self._main[1] += 1
+        elif is_main:
+            self._main = [tag, 1]
+            return
+        if not is_main and (tag in _BOILERPLATE_TAGS or attrs.get("role") in _BOILERPLATE_ROLES
+                            or _NOISE_RE.search(f" {attrs.get('class') or ''} {attrs.get('id') or ''} ")):
+            self._drop = [tag, 1]
+
+    def _append(self, data):
+        self._parts.append(data)
+        if self._main is not None:
+            self._main_parts.append(data)
+
+
+def _leave(block, tag):
+    if block is not None and tag == block[0]:
+        block[1] -= 1
+        if block[1] == 0:
+            return None
+    return block
+
+
+def _join_lines(parts) -> str:
+    lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def html_to_text(html: str, main_content: bool = False):
+    """返回 (正文, noscript 中的文字)"""
+    parser = _TextExtractor(main_content)
+    parser.feed(html)
+    parser.close()
+    return parser.text(), parser.noscript_text()
+
+
+def needs_browser(page: HttpPage):
+    """auto 模式的判定：需要浏览器渲染时返回原因，否则返回 None"""
+    host = (urlsplit(page.url).hostname or "").lower()
+    if any(host == d or host.endswith("." + d) for d in _JS_DOMAINS):
+        return f"JS 站点 {host}"
+    if page.status >= 400:
+        return f"HTTP {page.status}"
+    if not page.content_type.startswith(_TEXT_CONTENT_TYPES):
+        return f"不支持的内容类型 {page.content_type}"
+    if len(page.text) < _HTTP_MIN_TEXT:
+        if page.noscript_text and _JS_WALL_RE.search(page.noscript_text):
+            return "noscript 提示需要 JavaScript"
+        if _SPA_SHELL_RE.search(page.html):
+            return "单页应用空壳"
+        return "正文为空或过短"
+    return None
+
+
+_client = None
+_client_lock = asyncio.Lock()
+
+
+async def _get_client() -> httpx.AsyncClient:
+    global _client
+    async with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.AsyncClient(
+                follow_redirects=True,
+                timeout=_HTTP_TIMEOUT,
+                headers={"User-Agent": _USER_AGENT, "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8"},
+                limits=httpx.Limits(max_connections=_HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=_HTTP_MAX_CONNECTIONS),
+            )
+        return _client
+
+
+async def fetch_http(url: str, timeout: float = None, main_content: bool = False) -> HttpPage:
+    """用长连接复用的 HTTP 客户端抓取页面并直接从 HTML 提取正文"""
+    client = await _get_client()
+    with phase("http_fetch"):
+        async with client.stream("GET", url, timeout=timeout or _HTTP_TIMEOUT) as response:
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) >= _HTTP_MAX_BYTES:
+                    break
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            html = _decode(bytes(body), response.charset_encoding)
+            final_url = str(response.url)
+            status = response.status_code
+    if content_type.startswith(("text/html", "application/xhtml")) or not content_type:
+        # 大页面解析较耗 CPU，放到线程中避免阻塞事件循环
+        with phase("html_extract"):
+            text, noscript = await asyncio.to_thread(html_to_text, html, main_content)
+    else:
+        text, noscript = html, ""
+    return HttpPage(url=final_url, status=status, content_type=content_type or "text/html",
+                    html=html, text=text, noscript_text=noscript)
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _decode(body: bytes, header_encoding: str) -> str:
+    encoding = header_encoding
+    if not encoding:
+        match = _META_CHARSET_RE.search(body[:4096])
+        encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return body.decode(encoding, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
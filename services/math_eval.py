@@ -0,0 +1,359 @@
+import ast
+import functools
+import math
+import numbers
+import operator
+import os
+import re
+
+try:  # NumPy 可选：安装后大数组的统计与逐元素运算走向量化实现
+    import numpy as np
+except ImportError:  # pragma: no cover - 取决于部署环境
+    np = None
+
+_MAX_EXPRESSION_CHARS = int(os.getenv("MATH_EVAL_MAX_CHARS", "2000"))
+_MAX_ARRAY_LENGTH = int(os.getenv("MATH_EVAL_MAX_ARRAY", "1000000"))
+_VECTOR_MIN = int(os.getenv("MATH_EVAL_VECTOR_MIN", "1000"))  # 数组长度达到该值且安装了 NumPy 时使用向量化实现
+# 整数的二进制位数上限：防止 10**10**10 或逐行平方这类表达式耗尽 CPU 与内存；
+# 大整数运算持有 GIL，即使在线程池中执行也会卡住事件循环
+_MAX_INT_BITS = 100000
+
+_ASSIGN_RE = re.compile(r"^\s*([A-Za-z_]\w*)\s*=(?!=)(.+)$", re.S)
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Constant, ast.List, ast.Tuple, ast.Subscript, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    *_BIN_OPS, *_UNARY_OPS,
+)
+
+
+class _Vectorize(ast.NodeTransformer):
+    """把算术运算改写为 _binop/_unary 调用：数值走原生运算，数组逐元素（或用 NumPy）计算"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        return ast.copy_location(ast.Call(
+            func=ast.Name(id="_binop", ctx=ast.Load()),
+            args=[ast.Constant(type(node.op).__name__), node.left, node.right], keywords=[]), node)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return node
+        return ast.copy_location(ast.Call(
+            func=ast.Name(id="_unary", ctx=ast.Load()),
+            args=[ast.Constant(type(node.op).__name__), node.operand], keywords=[]), node)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(source: str):
+    """解析并校验表达式，返回可复用的代码对象；相同表达式只解析一次"""
+    if len(source) > _MAX_EXPRESSION_CHARS:
+        raise ValueError(f"表达式过长（超过 {_MAX_EXPRESSION_CHARS} 个字符）")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except (SyntaxError, RecursionError, MemoryError) as e:
+        raise ValueError(f"表达式语法错误: {source}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"不支持的语法: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id.startswith("_"):
+            raise ValueError(f"不允许的名称: {node.id}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS
+                                           or node.keywords):
+            raise ValueError("只能调用内置的数学函数，且不支持关键字参数")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"不支持的常量: {node.value!r}")
+    tree = ast.fix_missing_locations(_Vectorize().visit(tree))
+    return compile(tree, "<math_eval>", "eval")
+
+
+def evaluate(source: str, variables: dict = None):
+    """计算单个表达式，variables 中的数值或数组可在表达式中按名称引用"""
+    scope = {name: _check_value(value, name) for name, value in (variables or {}).items()}
+    return _check_result(to_python(eval(compile_expression(source), _GLOBALS, scope)))
+
+
+def evaluate_batch(expressions: list, variables: dict = None) -> list:
+    """按顺序计算多个表达式；"name = 表达式" 的结果可被后续表达式引用，出错的条目不会绑定变量。
+
+    返回与输入一一对应的 {"expression", "value"} 或 {"expression", "error"}。
+    """
+    scope = {name: _check_value(value, name) for name, value in (variables or {}).items()}
+    results = []
+    for source in expressions:
+        try:
+            if not isinstance(source, str):
+                raise ValueError("表达式必须是字符串")
+            match = _ASSIGN_RE.match(source)
+            name, body = (match.group(1), match.group(2)) if match else (None, source)
+            if name is not None and (name.startswith("_") or name in _GLOBALS):
+                raise ValueError(f"不能给 {name} 赋值")
+            value = eval(compile_expression(body), _GLOBALS, scope)
+            output = _check_result(to_python(value))
+            if name is not None:
+                scope[name] = value
+            results.append({"expression": source, "value": output})
+        except Exception as e:
+            results.append({"expression": source, "error": _describe(e)})
+    return results
+
+
+def to_python(value):
+    """NumPy 标量/数组转换为可 JSON 序列化的 Python 值"""
+    if np is not None:
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, np.generic):
+            return value.item()
+    if isinstance(value, (list, tuple)):
+        return [to_python(item) for item in value]
+    return value
+
+
+def _check_result(value):
+    """确认结果可以编码为标准 JSON：inf/nan 与位数超过 int 转字符串上限的整数作为该条目的错误返回"""
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"结果不是有限数值: {value}")
+    if isinstance(value, int) and not isinstance(value, bool):
+        try:
+            str(value)
+        except ValueError:
+            raise ValueError(f"整数结果过大（约 {int(value.bit_length() * 0.30103)} 位），无法输出") from None
+    if isinstance(value, list):
+        for item in value:
+            _check_result(item)
+    return value
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, ZeroDivisionError):
+        return "除数不能为 0"
+    if isinstance(error, NameError):
+        return f"未定义的变量: {error.name}" if getattr(error, "name", None) else str(error)
+    return str(error) or type(error).__name__
+
+
+def _check_value(value, name: str = "value"):
+    if isinstance(value, bool) or isinstance(value, numbers.Real):
+        return _check_int(value, f"变量 {name} ")
+    if isinstance(value, (list, tuple)):
+        if len(value) > _MAX_ARRAY_LENGTH:
+            raise ValueError(f"数组 {name} 过长（超过 {_MAX_ARRAY_LENGTH}）")
+        if not all(isinstance(item, numbers.Real) for item in value):
+            raise ValueError(f"数组 {name} 只能包含数字")
+        for item in value:
+            _check_int(item, f"数组 {name} ")
+        return list(value)
+    raise ValueError(f"变量 {name} 只能是数字或数字数组")
+
+
+# ---- 运算与函数 ----
+
+def _is_array(value) -> bool:
+    return isinstance(value, (list, tuple)) or (np is not None and isinstance(value, np.ndarray))
+
+
+def _use_numpy(*values) -> bool:
+    return np is not None and any(
+        isinstance(v, np.ndarray) or (_is_array(v) and len(v) >= _VECTOR_MIN) for v in values)
+
+
+def _binop(op_name: str, left, right):
+    op = _BIN_OPS[getattr(ast, op_name)]
+    if not _is_array(left) and not _is_array(right):
+        if op is operator.pow:
+            return _safe_pow(left, right)
+        if op is operator.mul and isinstance(left, int) and isinstance(right, int) \
+                and left.bit_length() + right.bit_length() > _MAX_INT_BITS:
+            raise ValueError("乘法结果过大")
+        return _check_int(op(left, right))
+    if _use_numpy(left, right):
+        return op(np.asarray(left, dtype=float), np.asarray(right, dtype=float))
+    if _is_array(left) and _is_array(right):
+        if len(left) != len(right):
+            raise ValueError(f"数组长度不一致: {len(left)} 与 {len(right)}")
+        pairs = zip(left, right)
+    elif _is_array(left):
+        pairs = ((item, right) for item in left)
+    else:
+        pairs = ((left, item) for item in right)
+    # 逐元素递归，嵌套数组同样按元素计算，不会退化成列表拼接或重复
+    return [_binop(op_name, a, b) for a, b in pairs]
+
+
+def _unary(op_name: str, value):
+    op = _UNARY_OPS[getattr(ast, op_name)]
+    if not _is_array(value):
+        return op(value)
+    if _use_numpy(value):
+        return op(np.asarray(value, dtype=float))
+    return [_unary(op_name, item) for item in value]
+
+
+def _safe_pow(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        # (位数 - 1) * 指数 是结果位数的下界，超过上限的可以在计算前拒绝，其余由 _check_int 兜底
+        if abs(base) > 1 and (abs(base).bit_length() - 1) * exponent > _MAX_INT_BITS:
+            raise ValueError("乘方结果过大")
+    return _check_int(operator.pow(base, exponent))
+
+
+def _check_int(value, what: str = "结果"):
+    if isinstance(value, int) and value.bit_length() > _MAX_INT_BITS:
+        raise ValueError(f"{what}过大（超过 {_MAX_INT_BITS} 位二进制）")
+    return value
+
+
+def _elementwise(fn, np_fn):
+    """标量函数对数组逐元素生效，大数组使用 NumPy 对应的 ufunc"""
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        if not any(_is_array(arg) for arg in args):
+            return fn(*args)
+        if np_fn is not None and _use_numpy(*args):
+            return np_fn(*(np.asarray(arg, dtype=float) if _is_array(arg) else arg for arg in args))
+        if len(args) == 1:
+            return [fn(item) for item in args[0]]
+        return [fn(*items) for items in zip(*(arg if _is_array(arg) else [arg] * _length(args) for arg in args))]
+
+    return wrapper
+
+
+def _length(args) -> int:
+    return next(len(arg) for arg in args if _is_array(arg))
+
+
+def _values(args) -> list:
+    """统计函数既接受一个数组也接受多个数字：sum([1, 2, 3]) 与 sum(1, 2, 3) 等价"""
+    values = args[0] if len(args) == 1 and _is_array(args[0]) else args
+    if len(values) == 0:
+        raise ValueError("数组不能为空")
+    return values
+
+
+def _sum(*args):
+    values = _values(args)
+    return np.sum(np.asarray(values, dtype=float)) if _use_numpy(values) else math.fsum(values)
+
+
+def _mean(*args):
+    values = _values(args)
+    return np.mean(np.asarray(values, dtype=float)) if _use_numpy(values) else math.fsum(values) / len(values)
+
+
+def _prod(*args):
+    values = _values(args)
+    if _use_numpy(values):
+        return np.prod(np.asarray(values, dtype=float))
+    return functools.reduce(lambda a, b: _binop("Mult", a, b), values, 1)
+
+
+def _min(*args):
+    values = _values(args)
+    return np.min(np.asarray(values, dtype=float)) if _use_numpy(values) else min(values)
+
+
+def _max(*args):
+    values = _values(args)
+    return np.max(np.asarray(values, dtype=float)) if _use_numpy(values) else max(values)
+
+
+def _variance(values, ddof: int = 1):
+    values = _values((values,))
+    if len(values) <= ddof:
+        raise ValueError("样本数量不足")
+    if _use_numpy(values):
+        return np.var(np.asarray(values, dtype=float), ddof=ddof)
+    mean = math.fsum(values) / len(values)
+    return math.fsum((v - mean) ** 2 for v in values) / (len(values) - ddof)
+
+
+def _stdev(values):
+    return math.sqrt(_variance(values))
+
+
+def _percentile(values, q):
+    """线性插值的百分位数（与 numpy.percentile 默认方法一致），q 可以是数字或数组"""
+    values = _values((values,))
+    if _is_array(q):
+        return [_percentile(values, item) for item in q]
+    if not 0 <= q <= 100:
+        raise ValueError("百分位必须在 0 到 100 之间")
+    if _use_numpy(values):
+        return np.percentile(np.asarray(values, dtype=float), q)
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    low = math.floor(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def _median(values):
+    return _percentile(values, 50)
+
+
+def _dot(a, b):
+    if not _is_array(a) or not _is_array(b):
+        raise ValueError("dot 需要两个数组")
+    if len(a) != len(b):
+        raise ValueError(f"数组长度不一致: {len(a)} 与 {len(b)}")
+    if _use_numpy(a, b):
+        return np.dot(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    return math.fsum(x * y for x, y in zip(a, b))
+
+
+def _len(values):
+    if not _is_array(values):
+        raise ValueError("len 需要一个数组")
+    return len(values)
+
+
+def _np(name):
+    return getattr(np, name) if np is not None else None
+
+
+FUNCTIONS = {
+    "abs": _elementwise(abs, _np("abs")),
+    "round": _elementwise(round, _np("round")),
+    "sqrt": _elementwise(math.sqrt, _np("sqrt")),
+    "exp": _elementwise(math.exp, _np("exp")),
+    "log": _elementwise(math.log, None),
+    "log10": _elementwise(math.log10, _np("log10")),
+    "log2": _elementwise(math.log2, _np("log2")),
+    "sin": _elementwise(math.sin, _np("sin")),
+    "cos": _elementwise(math.cos, _np("cos")),
+    "tan": _elementwise(math.tan, _np("tan")),
+    "asin": _elementwise(math.asin, _np("arcsin")),
+    "acos": _elementwise(math.acos, _np("arccos")),
+    "atan": _elementwise(math.atan, _np("arctan")),
+    "atan2": _elementwise(math.atan2, _np("arctan2")),
+    "floor": _elementwise(math.floor, _np("floor")),
+    "ceil": _elementwise(math.ceil, _np("ceil")),
+    "hypot": _elementwise(math.hypot, _np("hypot")),
+    "sum": _sum,
+    "mean": _mean,
+    "prod": _prod,
+    "min": _min,
+    "max": _max,
+    "median": _median,
+    "variance": _variance,
+    "stdev": _stdev,
+    "percentile": _percentile,
+    "dot": _dot,
+    "len": _len,
+}
+_CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau, "inf": math.inf}
+_GLOBALS = {"__builtins__": {}, "_binop": _binop, "_unary": _unary, **FUNCTIONS, **_CONSTANTS}
@@ -1,14 +1,21 @@
+import json
 import logging
 
 from mcp.server.fastmcp import FastMCP
 
+from services.executor import get_executor
+from services.math_eval import evaluate, evaluate_batch
+
 logger = logging.getLogger(__name__)
 
+_MAX_BATCH = 1000  # 单次 math_eval 最多计算的表达式数
+
+
 class MathService:
-    """处理文件相关操作的服务模块"""
+    """处理数学运算的服务模块"""
 
     def register_tools(self, mcp: FastMCP):
-
+        executor = get_executor("math")
 
         @mcp.tool()
         def add(a: float, b: float) -> float:
@@ -46,4 +53,30 @@ class MathService:
             logger.info("The divide method is called: a=%d, b=%d", a, b)  # 记录减法调用日志
             if b == 0:
                 raise ValueError("Division by zero is not allowed")
-            return a / b
\ No newline at end of file
+            return a / b
+
+        @mcp.tool()
+        async def math_eval(expression: str = None, expressions: list[str] = None, variables: dict = None) -> str:
+            """计算数学表达式，支持批量计算、变量绑定与数组统计，返回 JSON。
+
+            表达式支持 + - * / // % **、比较、x if cond else y、列表字面量与下标；数组之间的算术逐元素进行。
+            可用函数: abs round sqrt exp log log10 log2 sin cos tan asin acos atan atan2 floor ceil hypot，
+            统计函数: sum mean prod min max median variance stdev percentile(xs, q) dot(a, b) len；常量 pi e tau inf。
+
+            Args:
+                expression: 单个表达式，例如 "mean(xs) + 2 * stdev(xs)"
+                expressions: 按顺序计算的多个表达式，"name = 表达式" 的结果可被后续表达式引用，
+                    例如 ["total = dot(price, qty)", "total * 1.13"]；单条失败不影响其余条目
+                variables: 变量绑定，值为数字或数字数组，例如 {"xs": [1, 2, 3]}
+            """
+            if (expression is None) == (expressions is None):
+                raise ValueError("expression 与 expressions 需要且只能提供一个")
+            if expression is not None:
+                logger.info("The math_eval method is called: %s", expression)
+                return json.dumps({"value": await executor.run(evaluate, expression, variables)}, allow_nan=False)
+            if len(expressions) > _MAX_BATCH:
+                raise ValueError(f"一次最多计算 {_MAX_BATCH} 个表达式")
+            logger.info("The math_eval method is called with %d expressions", len(expressions))
+            results = await executor.run(evaluate_batch, expressions, variables)
+            return json.dumps({"results": results, "failed": sum(1 for r in results if "error" in r)},
+                              ensure_ascii=False, allow_nan=False)
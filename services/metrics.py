@@ -0,0 +1,225 @@
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_SLOW_CALL_MS = float(os.getenv("MCP_HUB_SLOW_CALL_MS", "0"))  # 超过该耗时的调用记一条 warning，0 为关闭
+_METRICS_PORT = int(os.getenv("MCP_HUB_METRICS_PORT", "9464"))  # FastMCP 不支持自定义路由时的独立端口
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# 当前正在执行的工具名，供子阶段计时时打标签；执行器会把它带进线程池
+_current_tool = contextvars.ContextVar("mcp_hub_current_tool", default="none")
+# 当前调用的结果标记；工具捕获异常后以字符串返回失败信息时通过 report_failure 标记
+_current_outcome = contextvars.ContextVar("mcp_hub_current_outcome", default=None)
+
+
+class _Metric:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", labels, value) for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets=_DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._values.items()]
+        samples = []
+        for labels, counts, total, count in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append(("_bucket", labels + (_format_value(bound),), bucket_count))
+            samples.append(("_bucket", labels + ("+Inf",), count))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, label_names=()):
+        return self._add(Counter(name, help_text, tuple(label_names)))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._add(Gauge(name, help_text, tuple(label_names)))
+
+    def histogram(self, name, help_text, label_names=(), buckets=_DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, tuple(label_names), buckets))
+
+    def render(self) -> str:
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                names = metric.label_names + (("le",) if suffix == "_bucket" else ())
+                label_text = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, labels))
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+TOOL_CALLS = REGISTRY.counter("mcp_hub_tool_calls_total", "Tool calls", ("service", "tool"))
+TOOL_ERRORS = REGISTRY.counter(
+    "mcp_hub_tool_errors_total", "Tool calls that raised or reported a failure", ("service", "tool"))
+TOOL_IN_FLIGHT = REGISTRY.gauge("mcp_hub_tool_in_flight", "Tool calls currently running", ("service", "tool"))
+TOOL_DURATION = REGISTRY.histogram("mcp_hub_tool_duration_seconds", "Tool call latency", ("service", "tool"))
+PHASE_DURATION = REGISTRY.histogram(
+    "mcp_hub_tool_phase_duration_seconds",
+    "Time spent in sub-phases (browser_start, page_load, http_fetch, subprocess, executor_wait, ...)",
+    ("tool", "phase"),
+)
+
+
+def instrument_tool(fn, tool: str, service: str):
+    """包装工具函数：记录调用数、失败数、并发数与耗时，并设置子阶段计时使用的工具名"""
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = _current_tool.set(tool)
+        outcome = {"failed": False}
+        outcome_token = _current_outcome.set(outcome)
+        TOOL_CALLS.inc(service, tool)
+        TOOL_IN_FLIGHT.inc(service, tool)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+            if inspect.isawaitable(result):
+                result = await result
+            if outcome["failed"]:
+                TOOL_ERRORS.inc(service, tool)
+            return result
+        except BaseException:
+            TOOL_ERRORS.inc(service, tool)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            TOOL_IN_FLIGHT.dec(service, tool)
+            TOOL_DURATION.observe(service, tool, value=elapsed)
+            if _SLOW_CALL_MS and elapsed * 1000 >= _SLOW_CALL_MS:
+                logger.warning("Slow tool call: %s.%s took %.0f ms", service, tool, elapsed * 1000)
+            _current_outcome.reset(outcome_token)
+            _current_tool.reset(token)
+
+    return wrapper
+
+
+def report_failure(message: str = "") -> str:
+    """标记当前工具调用失败并原样返回 message，用于捕获异常后返回错误文字的工具::
+
+        except Exception as e:
+            return report_failure(f"抓取失败: {e}")
+    """
+    outcome = _current_outcome.get()
+    if outcome is not None:
+        outcome["failed"] = True
+    return message
+
+
+@contextmanager
+def phase(name: str):
+    """记录当前工具某个子阶段的耗时，线程池内同样可用：``with phase("page_load"): ...``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.observe(_current_tool.get(), name, value=time.perf_counter() - start)
+
+
+def register_metrics_route(mcp, path: str = "/metrics"):
+    """在 SSE 服务旁边暴露 Prometheus 指标；旧版 FastMCP 没有 custom_route 时改用独立端口"""
+    if hasattr(mcp, "custom_route"):
+        from starlette.responses import PlainTextResponse
+
+        @mcp.custom_route(path, methods=["GET"])
+        async def metrics_endpoint(request):
+            return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+        return
+    _start_standalone_server(path)
+
+
+def _start_standalone_server(path: str):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != path:
+                self.send_error(404)
+                return
+            body = REGISTRY.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", _METRICS_PORT), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Metrics available at http://0.0.0.0:%d%s", _METRICS_PORT, path)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
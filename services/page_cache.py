@@ -0,0 +1,204 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+_CACHE_TTL = int(os.getenv("WEB_SEARCH_CACHE_TTL", "600"))  # 秒，0 表示关闭缓存
+_CACHE_MAX_BYTES = int(os.getenv("WEB_SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))  # 内存层上限
+_CACHE_PATH = os.getenv("WEB_SEARCH_CACHE_PATH", "")  # SQLite 文件路径，留空则只用内存
+_CACHE_DISK_MAX_BYTES = int(os.getenv("WEB_SEARCH_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def url_key(url: str, content: str = "full", source: str = "browser") -> str:
+    """规范化 URL 作为缓存键：小写 scheme/host、去掉默认端口与锚点、查询参数排序。
+
+    不同正文模式分开缓存；HTTP 快速路径抓取的结果（source="http"）与浏览器渲染的结果也分开缓存。
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = "url:" + urlunsplit((scheme, host, path, query, ""))
+    if content != "full":
+        key = f"{key}|{content}"
+    return key if source == "browser" else f"{key}#{source}"
+
+
+def query_key(query: str, template: str, limit: int) -> str:
+    """搜索结果列表的缓存键：搜索模板 + 折叠空白并忽略大小写后的关键词 + 条数"""
+    normalized = " ".join(query.split()).casefold()
+    return f"query:{template}|{limit}|{normalized}"
+
+
+class PageCache:
+    """抓取结果缓存：内存 LRU（按 TTL 与总字节数淘汰），可选 SQLite 磁盘层以便重启后保留。"""
+
+    def __init__(self, ttl: int = _CACHE_TTL, max_bytes: int = _CACHE_MAX_BYTES,
+                 path: str = _CACHE_PATH, disk_max_bytes: int = _CACHE_DISK_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "expired": 0}
+        self._db = None
+        self._disk_bytes = 0
+        if path and ttl > 0:
+            self._open_db(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                self._remove(key)
+                self._stats["expired"] += 1
+            value = self._db_get(key, now)
+            if value is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._stats["disk_hits"] += 1
+            self._put(key, value[0], value[1])
+            return value[1]
+
+    def set(self, key: str, value: str):
+        if not self.enabled or value is None:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._put(key, expires_at, value)
+            self._db_set(key, expires_at, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_bytes": self._disk_bytes if self._db is not None else None,
+                "ttl": self.ttl,
+            }
+
+    def _put(self, key, expires_at, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _open_db(self, path):
+        try:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        except sqlite3.Error:
+            logger.warning("Failed to open page cache database %s, using memory only", path, exc_info=True)
+            self._db = None
+
+    def _db_get(self, key, now):
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db_delete(key)
+                return None
+            self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            return row[1], row[0]
+        except sqlite3.Error:
+            logger.debug("Page cache read failed", exc_info=True)
+            return None
+
+    def _db_set(self, key, expires_at, value):
+        if self._db is None:
+            return
+        size = len(value.encode("utf-8"))
+        if size > self.disk_max_bytes:
+            return
+        try:
+            self._db_delete(key)
+            self._db.execute("INSERT INTO entries (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                             (key, value, size, expires_at, time.time()))
+            self._disk_bytes += size
+            if self._disk_bytes > self.disk_max_bytes:
+                self._db_evict()
+        except sqlite3.Error:
+            logger.debug("Page cache write failed", exc_info=True)
+
+    def _db_delete(self, key):
+        row = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _db_evict(self):
+        # 先清过期项，再按最近访问时间淘汰到上限以内
+        now = time.time()
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall()
+        for key, size in rows:
+            if self._disk_bytes <= self.disk_max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._disk_bytes -= size
+            self._stats["evictions"] += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> PageCache:
+    """进程内共享的网页缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache()
+        return _cache
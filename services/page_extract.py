@@ -0,0 +1,95 @@
+import os
+
+from services.metrics import phase
+
+CONTENT_MODES = ("full", "main")
+DEFAULT_CONTENT_MODE = os.getenv("WEB_SEARCH_CONTENT_MODE", "full")
+# 单页从浏览器取回的正文上限；最终返回给客户端的内容还会按各工具自己的预算再截断
+_EXTRACT_MAX_BYTES = int(os.getenv("WEB_SEARCH_EXTRACT_MAX_BYTES", str(256 * 1024)))
+
+# 正文抽取：一次 execute_script 完成选取主体、剔除导航/页脚/广告、按字节截断
+_PAGE_TEXT_JS = """
+const maxBytes = arguments[0];
+const mainOnly = arguments[1];
+const body = document.body;
+if (!body) return ["", false];
+
+const BOILERPLATE = "nav, footer, header, aside, form, iframe, [role=navigation], [role=banner], " +
+    "[role=contentinfo], [role=complementary], [aria-hidden=true]";
+const NOISE_RE = /(^|[\\s_-])(ads?|advert\\w*|banner|sponsor\\w*|promo\\w*|cookie\\w*|share|social|related|recommend\\w*|comments?|sidebar|footer|nav\\w*|menu|breadcrumbs?|popup|modal)([\\s_-]|$)/i;
+
+let root = body;
+const hidden = [];
+if (mainOnly) {
+    const hide = (el) => {
+        if (el.style.display === "none") return;
+        hidden.push([el, el.style.getPropertyValue("display"), el.style.getPropertyPriority("display")]);
+        el.style.setProperty("display", "none", "important");
+    };
+    body.querySelectorAll(BOILERPLATE).forEach(hide);
+    body.querySelectorAll("[class], [id]").forEach((el) => {
+        if (el === body || el.tagName === "ARTICLE" || el.tagName === "MAIN") return;
+        const name = (typeof el.className === "string" ? el.className : "") + " " + el.id;
+        if (NOISE_RE.test(name)) hide(el);
+    });
+
+    const candidate = body.querySelector("article, main, [role=main]");
+    if (candidate && candidate.innerText.trim().length > 200) {
+        root = candidate;
+    } else {
+        // 没有语义标签时，按段落文字量给父节点打分，取得分最高的容器
+        const scores = new Map();
+        body.querySelectorAll("p, pre, blockquote").forEach((p) => {
+            const length = p.innerText.trim().length;
+            if (length < 25) return;
+            let node = p.parentElement;
+            for (let weight = 1; node && weight >= 0.25; weight /= 2, node = node.parentElement) {
+                scores.set(node, (scores.get(node) || 0) + length * weight);
+            }
+        });
+        let bestScore = 200;
+        scores.forEach((score, node) => {
+            if (score > bestScore) { bestScore = score; root = node; }
+        });
+    }
+}
+
+let text = root.innerText;
+hidden.forEach(([el, value, priority]) => el.style.setProperty("display", value, priority));
+
+const bytes = new TextEncoder().encode(text);
+if (bytes.length <= maxBytes) return [text, false];
+text = new TextDecoder("utf-8").decode(bytes.slice(0, maxBytes)).replace(/\\uFFFD+$/, "");
+return [text, true];
+"""
+
+# 搜索结果：按选择器顺序一次性取回 (标题, 链接)
+_SEARCH_RESULTS_JS = """
+const selectors = arguments[0];
+const limit = arguments[1];
+const results = [];
+for (const selector of selectors) {
+    for (const el of document.querySelectorAll(selector)) {
+        const title = (el.innerText || "").trim();
+        const link = el.closest("a") || el.querySelector("a");
+        const href = link ? link.href : "";
+        if (!title || !href) continue;
+        results.push([title, href]);
+        if (results.length >= limit) return results;
+    }
+}
+return results;
+"""
+
+
+def extract_page_text(driver, content: str = DEFAULT_CONTENT_MODE, max_bytes: int = _EXTRACT_MAX_BYTES):
+    """一次往返取回页面正文，返回 (正文, 是否被截断)。content="main" 时只保留正文主体。"""
+    with phase("dom_extract"):
+        text, truncated = driver.execute_script(_PAGE_TEXT_JS, max_bytes, content == "main")
+    return text or "", bool(truncated)
+
+
+def extract_search_results(driver, selectors, limit: int):
+    """一次往返取回搜索结果列表 [(标题, 链接), ...]"""
+    results = driver.execute_script(_SEARCH_RESULTS_JS, list(selectors), limit) or []
+    return [(title, href) for title, href in results]
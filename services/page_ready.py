@@ -0,0 +1,72 @@
+import os
+import time
+
+from services.metrics import phase
+
+_READY_TIMEOUT = float(os.getenv("WEB_SEARCH_READY_TIMEOUT", "5"))  # 单次等待的上限（秒）
+_QUIET_WINDOW = float(os.getenv("WEB_SEARCH_READY_QUIET_MS", "300")) / 1000  # DOM 静默多久视为渲染完成
+_POLL_INTERVAL = float(os.getenv("WEB_SEARCH_READY_POLL_MS", "100")) / 1000
+
+# 一次往返同时取回 readyState 与 DOM 规模，用于判断页面是否还在变化
+_SNAPSHOT_JS = """
+const body = document.body;
+return [
+    document.readyState,
+    body ? body.innerText.length : 0,
+    document.getElementsByTagName('*').length
+];
+"""
+
+_ANY_SELECTOR_JS = """
+const selectors = arguments[0];
+for (const selector of selectors) {
+    if (document.querySelector(selector)) return true;
+}
+return false;
+"""
+
+
+def wait_until_ready(driver, timeout: float = _READY_TIMEOUT, quiet: float = _QUIET_WINDOW) -> bool:
+    """等待页面就绪：readyState 为 complete，且正文长度与节点数在 quiet 秒内不再变化。
+
+    超过 timeout 仍未稳定时直接返回 False，由调用方按现有内容继续处理。
+    """
+    with phase("page_ready"):
+        return _wait_stable(driver, timeout, quiet)
+
+
+def _wait_stable(driver, timeout: float, quiet: float) -> bool:
+    deadline = time.monotonic() + max(timeout, 0)
+    last_snapshot = None
+    stable_since = None
+    while True:
+        now = time.monotonic()
+        try:
+            state, text_length, node_count = driver.execute_script(_SNAPSHOT_JS)
+        except Exception:
+            state, text_length, node_count = None, None, None
+        snapshot = (text_length, node_count)
+        if state == "complete" and snapshot == last_snapshot:
+            if stable_since is not None and now - stable_since >= quiet:
+                return True
+        else:
+            stable_since = now
+        last_snapshot = snapshot
+        if now >= deadline:
+            return False
+        time.sleep(min(_POLL_INTERVAL, max(deadline - now, 0)))
+
+
+def wait_for_any_selector(driver, selectors, timeout: float = _READY_TIMEOUT) -> bool:
+    """等待任一 CSS 选择器出现在页面上，用于搜索结果页"""
+    deadline = time.monotonic() + max(timeout, 0)
+    while True:
+        try:
+            if driver.execute_script(_ANY_SELECTOR_JS, list(selectors)):
+                return True
+        except Exception:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(_POLL_INTERVAL, remaining))
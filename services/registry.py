@@ -0,0 +1,110 @@
+import importlib
+import json
+import logging
+import os
+import platform
+from dataclasses import dataclass, field
+
+from mcp.server.fastmcp import FastMCP
+
+from services.admission import AdmissionController, load_limits
+from services.metrics import instrument_tool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ServiceSpec:
+    name: str
+    module: str
+    class_name: str
+    platforms: tuple = ()  # 允许运行的 platform.system() 值，为空表示不限制
+    kwargs: dict = field(default_factory=dict)
+
+
+# 可注册的子服务。服务模块本身只做轻量导入，selenium 等重依赖在工具首次调用时才导入
+SERVICES = [
+    # ServiceSpec("file", "services.file_service", "FileService"),
+    ServiceSpec("system", "services.system_service", "SystemService"),
+    ServiceSpec("math", "services.math_service", "MathService"),
+    ServiceSpec("web", "services.web_search_service", "WebSearch"),
+    ServiceSpec("git", "services.git_service", "GitService"),
+    # macOS 上写入系统日历，其余平台使用本地 .ics 后端（CALENDAR_BACKEND / CALENDAR_ICS_PATH）
+    ServiceSpec("calendar", "services.calendar_service", "CalendarService"),
+]
+
+
+class _ServiceMCP:
+    """传给各服务 register_tools 的 FastMCP 代理：注册工具时统一套上准入控制与指标采集，服务代码无需改动"""
+
+    def __init__(self, mcp: FastMCP, service: str, admission: AdmissionController = None):
+        self._mcp = mcp
+        self._service = service
+        self._admission = admission
+
+    def tool(self, name: str = None, **kwargs):
+        register = self._mcp.tool(name=name, **kwargs)
+
+        def decorator(fn):
+            tool_name = name or fn.__name__
+            if self._admission is not None:
+                fn = self._admission.wrap(fn, tool_name, self._service)
+            # 指标包在最外层，排队与被拒绝的调用同样计入耗时和错误数
+            return register(instrument_tool(fn, tool_name, self._service))
+
+        return decorator
+
+    def __getattr__(self, item):
+        return getattr(self._mcp, item)
+
+
+def load_config() -> dict:
+    """读取 MCP_HUB_CONFIG 指向的 JSON 配置文件，例如::
+
+        {"services": ["system", "math", "git"], "git": {"default_workspace": "/data/repos"},
+         "limits": {"web": {"max_concurrency": 2, "max_queue": 8, "timeout": 60}}}
+    """
+    path = os.getenv("MCP_HUB_CONFIG")
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def enabled_services(config: dict = None) -> list:
+    """要启用的服务名：环境变量 MCP_HUB_SERVICES（逗号分隔）优先，其次是配置文件的 services，默认全部"""
+    config = config if config is not None else load_config()
+    names = os.getenv("MCP_HUB_SERVICES")
+    if names:
+        names = [n.strip() for n in names.split(",") if n.strip()]
+    else:
+        names = config.get("services") or ["all"]
+    if "all" in names:
+        return [spec.name for spec in SERVICES]
+    known = {spec.name for spec in SERVICES}
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise ValueError(f"Unknown services: {', '.join(unknown)}")
+    return names
+
+
+def register_services(mcp: FastMCP, config: dict = None) -> list:
+    """按配置注册子服务工具，跳过平台不满足的服务，返回实际注册的服务名"""
+    config = config if config is not None else load_config()
+    names = enabled_services(config)
+    admission = AdmissionController(load_limits(config))
+    system = platform.system()
+    registered = []
+    for spec in SERVICES:
+        if spec.name not in names:
+            continue
+        if spec.platforms and system not in spec.platforms:
+            logger.info("Skipping service %s: requires %s, running on %s",
+                        spec.name, "/".join(spec.platforms), system)
+            continue
+        service_cls = getattr(importlib.import_module(spec.module), spec.class_name)
+        kwargs = {**spec.kwargs, **config.get(spec.name, {})}
+        service_cls(**kwargs).register_tools(_ServiceMCP(mcp, spec.name, admission))
+        registered.append(spec.name)
+    logger.info("Registered services: %s", ", ".join(registered))
+    return registered
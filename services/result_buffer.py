@@ -0,0 +1,89 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+_BUFFER_TTL = int(os.getenv("MCP_HUB_RESULT_BUFFER_TTL", "600"))  # 游标有效期（秒）
+_BUFFER_MAX_BYTES = int(os.getenv("MCP_HUB_RESULT_BUFFER_MAX_BYTES", str(16 * 1024 * 1024)))
+PAGE_CHARS = int(os.getenv("MCP_HUB_RESULT_PAGE_CHARS", "10000"))  # 每页返回的字符数
+
+
+class ResultBuffer:
+    """大结果的服务端分页缓冲：首页直接返回，其余部分按游标取回，不必重新抓取。
+
+    按 TTL 与总字节数淘汰（LRU），游标失效后需要重新调用原工具。
+    """
+
+    def __init__(self, ttl: int = _BUFFER_TTL, max_bytes: int = _BUFFER_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # id -> (expires_at, text, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def paginate(self, text: str, page_chars: int = PAGE_CHARS) -> str:
+        """返回第一页；还有剩余内容时把全文放进缓冲区，并在末尾附上取下一页的游标"""
+        if len(text) <= page_chars:
+            return text
+        buffer_id = self._put(text)
+        return self._render(buffer_id, text, 0, page_chars)
+
+    def page(self, cursor: str, page_chars: int = PAGE_CHARS) -> str:
+        """按游标（id:offset）取回后续一页"""
+        buffer_id, _, offset = cursor.partition(":")
+        if not offset.isdigit():
+            raise ValueError(f"无效的游标: {cursor}")
+        text = self._get(buffer_id)
+        if text is None:
+            raise KeyError(f"游标已过期或不存在: {cursor}，请重新调用原工具")
+        return self._render(buffer_id, text, int(offset), page_chars)
+
+    def _render(self, buffer_id: str, text: str, offset: int, page_chars: int) -> str:
+        end = offset + page_chars
+        chunk = text[offset:end]
+        if end >= len(text):
+            return chunk
+        return f"{chunk}\n\n[还有 {len(text) - end} 字符未返回，继续获取请使用 cursor=\"{buffer_id}:{end}\"]"
+
+    def _put(self, text: str) -> str:
+        size = len(text.encode("utf-8"))
+        buffer_id = secrets.token_urlsafe(8)
+        with self._lock:
+            self._expire(time.time())
+            self._entries[buffer_id] = (time.time() + self.ttl, text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+        return buffer_id
+
+    def _get(self, buffer_id: str):
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(buffer_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(buffer_id)
+            return entry[1]
+
+    def _expire(self, now: float):
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+
+    def _remove(self, buffer_id: str):
+        _, _, size = self._entries.pop(buffer_id)
+        self._bytes -= size
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_result_buffer() -> ResultBuffer:
+    """进程内共享的结果分页缓冲"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ResultBuffer()
+        return _buffer
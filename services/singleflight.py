@@ -0,0 +1,50 @@
+import asyncio
+
+from services.admission import detached_context
+
+
+class _Flight:
+    def __init__(self, task, scope):
+        self.task = task
+        self.scope = scope
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合并并发的相同请求：同一个 key 同时只执行一次，所有调用方共享结果或异常。
+
+    共享任务在独立的取消范围中运行，并通过 ``asyncio.shield`` 等待：某个调用方超时或被取消（如客户端断开）
+    只会结束它自己的等待，不会关闭其他调用方仍在使用的浏览器；最后一个调用方离开时才取消共享任务。
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, coro_factory):
+        flight = self._inflight.get(key)
+        if flight is None:
+            # 不能在调用方的上下文中创建任务，否则会继承调用方的取消范围
+            context, scope = detached_context()
+            task = context.run(asyncio.ensure_future, coro_factory())
+            flight = self._inflight[key] = _Flight(task, scope)
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # 没有调用方还需要这个结果：停止共享工作，释放浏览器等资源
+                flight.task.cancel()
+                flight.scope.cancel()
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    def _forget(self, key, task):
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        # 所有调用方都已离开时避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
@@ -1,139 +1,328 @@
+import asyncio
+import json
+import logging
 import os
 import time
 from urllib.parse import quote_plus
 
-from mcp.server.fastmcp import FastMCP
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from mcp.server.fastmcp import Context, FastMCP
+
+from services.browser_pool import get_browser_pool, navigate, warm_on_start
+from services.executor import get_executor
+from services.http_fetch import FETCH_MODES, fetch_http, needs_browser
+from services.metrics import report_failure
+from services.page_cache import get_page_cache, query_key, url_key
+from services.page_extract import CONTENT_MODES, DEFAULT_CONTENT_MODE, extract_page_text, extract_search_results
+from services.page_ready import wait_for_any_selector, wait_until_ready
+from services.result_buffer import get_result_buffer
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_RESULT_SELECTORS = [
+    ("DuckDuckGo", "a.result__a"),
+    ("Google", "div#search a h3"),
+    ("Bing", "li.b_algo h2 a"),
+]
+
+# 进度通知中每条结果附带的正文摘要长度；完整正文只在最终结果中返回一次
+_PROGRESS_EXCERPT_CHARS = 200
+
+# 进程内正在进行的抓取，按缓存键合并
+_flights = SingleFlight()
 
 
 class WebSearch:
     def register_tools(self, mcp: FastMCP):
+        # selenium 只在首次调用时导入；WEB_SEARCH_POOL_WARM_ON_START=1 时启动即预热浏览器池
+        if warm_on_start():
+            get_browser_pool().warm()
+        # Selenium 调用全部是阻塞的，统一放到 web 执行器的线程池中运行
+        executor = get_executor("web")
+
         @mcp.tool(name="web_search_url")
-        async def web_search_url(url: str) -> str:
+        async def web_search_url(url: str, mode: str = "auto", content: str = DEFAULT_CONTENT_MODE) -> str:
             """
-            使用真实 Chrome 浏览器打开网页并提取文本。
+            打开网页并提取文本。
             适用于含有大量 JavaScript 渲染或有反爬限制的网站（如今日头条）。
+            正文较长时只返回第一页，末尾附带 cursor，可用 web_search_more 继续获取。
+            :param url: 网页地址
+            :param mode: auto（默认，静态页面直接 HTTP 抓取，需要 JS 时自动改用 Chrome）/ http / browser
+            :param content: full 返回整页文字；main 只返回正文主体（去掉导航、页脚、广告等）
             """
-            # 配置 Chrome 选项
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # 无头模式
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            # 伪装成普通用户浏览器
-            chrome_options.add_argument(
-                "user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
-
-            driver = None
+            error = _check_modes(mode, content)
+            if error:
+                return error
             try:
-                # 自动下载并启动 ChromeDriver
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-
-                # 设置页面加载超时
-                driver.set_page_load_timeout(30)
-                driver.get(url)
-
-                # 等待几秒让动态内容（JavaScript）加载完成
-                time.sleep(5)
-
-                # 获取网页主体文字
-                body_text = driver.find_element("tag name", "body").text
-
-                return f"--- 浏览器抓取成功 ({url}) ---\n\n{body_text[:10000]}"
+                # 命中缓存时直接返回，完全不启动浏览器
+                body_text, source = _cached_text(url, mode, content), "缓存"
+                if body_text is None:
+                    # 并发的相同 URL 共享同一次抓取
+                    body_text, source = await _flights.do(
+                        (mode, url_key(url, content)), lambda: _load_url(executor, url, mode, content))
+                return f"--- 抓取成功 ({url}, {source}) ---\n\n" + get_result_buffer().paginate(body_text)
 
             except Exception as e:
-                return f"Chrome 抓取失败: {str(e)}"
-            finally:
-                if driver:
-                    driver.quit()  # 必须关闭浏览器进程，否则会占用大量内存
+                return report_failure(f"抓取失败: {str(e)}")
 
         @mcp.tool(name="web_search_query")
-        async def web_search_query(query: str) -> str:
+        async def web_search_query(query: str, mode: str = "auto", content: str = DEFAULT_CONTENT_MODE,
+                                   ctx: Context = None) -> str:
             """
             使用真实 Chrome 浏览器搜索关键词并返回前几条结果。
             默认使用 DuckDuckGo，可通过环境变量 WEB_SEARCH_QUERY_URL 自定义搜索引擎模板。
             模板示例：https://duckduckgo.com/?q={query}
+            每条结果页抓取完成后立即通过 MCP 进度与日志通知推送；
+            完整结果过长时分页返回，用 web_search_more 继续获取。
+            :param mode: 结果页的抓取方式 auto / http / browser，含义同 web_search_url
+            :param content: 结果页正文模式 full / main，含义同 web_search_url
             """
             if not query or not isinstance(query, str):
-                return "参数错误：query 不能为空。"
-
-            chrome_options = Options()
-            chrome_options.add_argument("--headless")  # 无头模式
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument(
-                "user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+                return report_failure("参数错误：query 不能为空。")
+            error = _check_modes(mode, content)
+            if error:
+                return error
 
             search_url_tpl = os.getenv("WEB_SEARCH_QUERY_URL", "https://duckduckgo.com/?q={query}")
             limit = int(os.getenv("WEB_SEARCH_QUERY_LIMIT", "5"))
+            concurrency = int(os.getenv("WEB_SEARCH_QUERY_CONCURRENCY", "3"))  # 同时抓取的结果页数量
             content_limit_bytes = int(os.getenv("WEB_SEARCH_QUERY_CONTENT_MAX_BYTES", "51200"))  # 50 KB
             fetch_timeout = int(os.getenv("WEB_SEARCH_QUERY_FETCH_TIMEOUT", "10"))
+            deadline = time.monotonic() + float(os.getenv("WEB_SEARCH_QUERY_DEADLINE", "30"))  # 整个查询的截止时间
 
-            driver = None
             try:
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-                driver.set_page_load_timeout(30)
+                cache = get_page_cache()
+                key = query_key(query, search_url_tpl, limit)
+                cached = cache.get(key)
+                if cached is not None:
+                    results = [tuple(item) for item in json.loads(cached)]
+                else:
+                    search_url = search_url_tpl.format(query=quote_plus(query))
+                    results = await _flights.do(key, lambda: _load_search_results(executor, search_url, limit, key))
+                if not results:
+                    return report_failure(f"未找到结果或解析失败：{query}")
 
-                search_url = search_url_tpl.format(query=quote_plus(query))
-                driver.get(search_url)
-                time.sleep(3)
+                done = 0
 
-                results = _extract_search_results(driver, limit)
-                if not results:
-                    return f"未找到结果或解析失败：{query}"
+                async def on_result(index, text):
+                    # 先到先推送，客户端不必等所有结果页都抓完
+                    nonlocal done
+                    done += 1
+                    title, url = results[index]
+                    await ctx.report_progress(done, len(results), f"{index + 1}. {title}")
+                    await ctx.info(_format_result(index, title, url, _excerpt(text)))
 
-                lines = []
-                for idx, (title, url) in enumerate(results, start=1):
-                    text = _fetch_page_text(driver, url, fetch_timeout, content_limit_bytes)
-                    lines.append(f"{idx}. {title}\n   {url}\n   {text}")
-                return f"--- 搜索结果 ({query}) ---\n\n" + "\n".join(lines)
+                # 结果页并发抓取，但最终仍按搜索排名顺序输出
+                texts = await _fetch_pages(executor, [url for _, url in results], concurrency, deadline,
+                                           fetch_timeout, content_limit_bytes, mode, content,
+                                           on_result=on_result if _wants_progress(ctx) else None)
+                lines = [_format_result(idx, title, url, text)
+                         for idx, ((title, url), text) in enumerate(zip(results, texts))]
+                return get_result_buffer().paginate(f"--- 搜索结果 ({query}) ---\n\n" + "\n".join(lines))
             except Exception as e:
-                return f"Chrome 搜索失败: {str(e)}"
-            finally:
-                if driver:
-                    driver.quit()
-
-
-def _extract_search_results(driver, limit: int):
-    results = []
-    selectors = [
-        ("DuckDuckGo", "a.result__a"),
-        ("Google", "div#search a h3"),
-        ("Bing", "li.b_algo h2 a"),
-    ]
-
-    for _, selector in selectors:
-        elements = driver.find_elements(By.CSS_SELECTOR, selector)
-        for el in elements:
+                return report_failure(f"Chrome 搜索失败: {str(e)}")
+
+        @mcp.tool(name="web_search_more")
+        async def web_search_more(cursor: str) -> str:
+            """
+            获取 web_search_url / web_search_query 长结果的后续内容，直接读取服务端缓冲，不会重新抓取。
+            :param cursor: 上一页末尾给出的 cursor
+            """
             try:
-                title = el.text.strip()
-                href = el.get_attribute("href")
-                if not title or not href:
-                    continue
-                results.append((title, href))
-                if len(results) >= limit:
-                    return results
-            except Exception:
-                continue
+                return get_result_buffer().page(cursor)
+            except (KeyError, ValueError) as e:
+                return report_failure(f"获取失败: {e.args[0]}")
 
-    return results
+        @mcp.tool(name="web_search_cache_stats")
+        async def web_search_cache_stats() -> str:
+            """查看网页抓取缓存的命中率、条目数与占用字节数"""
+            return json.dumps(get_page_cache().stats(), ensure_ascii=False)
+
+
+def _format_result(index: int, title: str, url: str, text: str) -> str:
+    return f"{index + 1}. {title}\n   {url}\n   {text}"
+
+
+def _wants_progress(ctx: Context) -> bool:
+    """客户端在请求中带了 progressToken 才推送逐条结果，否则只返回最终结果"""
+    if ctx is None:
+        return False
+    try:
+        meta = ctx.request_context.meta
+    except ValueError:  # 不在 MCP 请求中调用（例如直接调用工具函数）
+        return False
+    return meta is not None and meta.progressToken is not None
+
+
+def _excerpt(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= _PROGRESS_EXCERPT_CHARS else text[:_PROGRESS_EXCERPT_CHARS] + "…"
+
+
+def _check_modes(mode: str, content: str):
+    if mode not in FETCH_MODES:
+        return report_failure(f"参数错误：mode 只能是 {'/'.join(FETCH_MODES)}。")
+    if content not in CONTENT_MODES:
+        return report_failure(f"参数错误：content 只能是 {'/'.join(CONTENT_MODES)}。")
+    return None
+
+
+def _cached_text(url: str, mode: str, content: str):
+    """按抓取方式查缓存：browser 只接受浏览器渲染的结果，http 只接受 HTTP 抓取的结果，auto 两者皆可"""
+    cache = get_page_cache()
+    sources = {"browser": ("browser",), "http": ("http",)}.get(mode, ("browser", "http"))
+    for source in sources:
+        text = cache.get(url_key(url, content, source))
+        if text is not None:
+            return text
+    return None
 
 
-def _fetch_page_text(driver, url: str, timeout: int, max_bytes: int) -> str:
+async def _load_url(executor, url: str, mode: str, content: str):
+    body_text, source = await _fetch_via_http(url, mode, content), "HTTP"
+    if body_text is None:
+        body_text, source = await executor.run(_browse_url, url, content), "浏览器"
+    get_page_cache().set(url_key(url, content, "http" if source == "HTTP" else "browser"), body_text)
+    return body_text, source
+
+
+async def _fetch_via_http(url: str, mode: str, content: str, timeout: float = None):
+    """http/auto 模式下先尝试无浏览器抓取；返回 None 表示需要回退到 Chrome"""
+    if mode == "browser":
+        return None
     try:
-        driver.set_page_load_timeout(timeout)
-        driver.get(url)
-        time.sleep(2)
-        body_text = driver.find_element(By.TAG_NAME, "body").text
-        data = body_text.encode("utf-8")
-        if len(data) > max_bytes:
-            data = data[:max_bytes]
-            return data.decode("utf-8", errors="ignore") + "\n   [内容已截断]"
+        page = await fetch_http(url, timeout=timeout, main_content=content == "main")
+    except Exception:
+        if mode == "http":
+            raise
+        logger.debug("HTTP fetch failed for %s, falling back to browser", url, exc_info=True)
+        return None
+    if mode == "http":
+        if page.status >= 400:
+            raise RuntimeError(f"HTTP {page.status}")
+        return page.text
+    reason = needs_browser(page)
+    if reason:
+        logger.info("Falling back to browser for %s: %s", url, reason)
+        return None
+    return page.text
+
+
+async def _load_search_results(executor, search_url: str, limit: int, key: str):
+    results = await executor.run(_browse_search_page, search_url, limit)
+    if results:
+        get_page_cache().set(key, json.dumps(results, ensure_ascii=False))
+    return results
+
+
+def _browse_url(url: str, content: str) -> str:
+    # 从浏览器池借出一个干净的会话，用完归还而不是退出浏览器
+    with get_browser_pool().session(page_load_timeout=30) as driver:
+        navigate(driver, url)
+
+        # 等待动态内容（JavaScript）渲染稳定，最多等待 WEB_SEARCH_READY_TIMEOUT 秒
+        wait_until_ready(driver)
+
+        # 一次往返取回网页主体文字
+        body_text, _ = extract_page_text(driver, content)
         return body_text
-    except Exception as e:
-        return f"[抓取失败: {str(e)}]"
+
+
+def _browse_search_page(search_url: str, limit: int):
+    selectors = [selector for _, selector in _RESULT_SELECTORS]
+    with get_browser_pool().session(page_load_timeout=30) as driver:
+        navigate(driver, search_url)
+        # 结果列表出现即可解析，不必等整页稳定
+        wait_for_any_selector(driver, selectors, timeout=3)
+        return extract_search_results(driver, selectors, limit)
+
+
+async def _fetch_pages(executor, urls, concurrency: int, deadline: float, timeout: int, max_bytes: int,
+                       mode: str = "auto", content: str = DEFAULT_CONTENT_MODE, on_result=None):
+    """并发抓取多个结果页，每页各自借用一个浏览器；截止时间到达时仍未完成的页面标记为超时。
+
+    on_result(index, text) 为协程函数，每个页面成功抓取后按完成顺序立即回调。
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(index, url):
+        text = await fetch_text(url)
+        if on_result is not None:
+            try:
+                await on_result(index, text)
+            except Exception:
+                logger.debug("Failed to report result %d", index, exc_info=True)
+        return text
+
+    async def fetch_text(url):
+        cached = _cached_text(url, mode, content)
+        if cached is not None:
+            return _truncate_bytes(cached, max_bytes)
+        async with semaphore:
+            text, complete = await _flights.do(("result", mode, url_key(url, content)), lambda: load(url))
+        if not complete:
+            return "[部分内容：页面加载超时] " + _truncate_bytes(text, max_bytes)
+        return _truncate_bytes(text, max_bytes)
+
+    async def load(url):
+        cache = get_page_cache()
+        text = await _fetch_via_http(url, mode, content, max(0.1, min(timeout, deadline - time.monotonic())))
+        if text is not None:
+            cache.set(url_key(url, content, "http"), text)
+            return text, True
+        text, complete, truncated = await executor.run(_fetch_result_page, url, deadline, timeout, max_bytes,
+                                                       content)
+        if truncated:
+            text += "\n   [内容已截断]"
+        elif complete:
+            # 只缓存完整加载且未截断的页面
+            cache.set(url_key(url, content), text)
+        return text, complete
+
+    tasks = [asyncio.ensure_future(fetch(index, url)) for index, url in enumerate(urls)]
+    await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+
+    texts = []
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+            texts.append("[超时：截止时间内未完成加载]")
+        elif task.exception() is not None:
+            texts.append(f"[抓取失败: {str(task.exception())}]")
+        else:
+            texts.append(task.result())
+    return texts
+
+
+def _fetch_result_page(url: str, deadline: float, timeout: int, max_bytes: int, content: str):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("截止时间内未完成加载")
+    with get_browser_pool().session(page_load_timeout=min(timeout, remaining),
+                                    acquire_timeout=remaining) as driver:
+        return _fetch_page_text(driver, url, min(timeout, deadline - time.monotonic()), max_bytes, content)
+
+
+def _fetch_page_text(driver, url: str, timeout: float, max_bytes: int, content: str):
+    """返回 (正文, 是否完整加载, 是否被截断)；正文在浏览器内按 max_bytes 截断，减少回传数据量"""
+    from selenium.common.exceptions import TimeoutException
+
+    driver.set_page_load_timeout(max(timeout, 0.1))
+    try:
+        navigate(driver, url)
+    except TimeoutException:
+        # 页面没加载完：停止加载，返回已渲染出来的部分内容
+        driver.execute_script("window.stop();")
+        text, truncated = extract_page_text(driver, content, max_bytes)
+        return text, False, truncated
+    wait_until_ready(driver, timeout=min(2.0, timeout))
+    text, truncated = extract_page_text(driver, content, max_bytes)
+    return text, True, truncated
+
+
+def _truncate_bytes(text: str, max_bytes: int) -> str:
+    data = text.encode("utf-8")
+    if len(data) > max_bytes:
+        data = data[:max_bytes]
+        return data.decode("utf-8", errors="ignore") + "\n   [内容已截断]"
+    return text
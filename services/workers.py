@@ -0,0 +1,249 @@
+import asyncio
+import itertools
+import logging
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+_DRAIN_TIMEOUT = float(os.getenv("MCP_HUB_DRAIN_TIMEOUT", "30"))  # 关闭时等待已有连接结束的上限（秒）
+_STOP_TIMEOUT = float(os.getenv("MCP_HUB_WORKER_STOP_TIMEOUT", "10"))  # 发送 SIGTERM 后等待 worker 退出的上限
+_START_TIMEOUT = float(os.getenv("MCP_HUB_WORKER_START_TIMEOUT", "30"))
+_HEADER_TIMEOUT = 10  # 读取请求头的超时，防止慢连接占住代理
+_MAX_HEADER_BYTES = 64 * 1024
+_CHUNK = 64 * 1024
+
+# 多 worker 模式下每个 worker 的消息路径带上自己的编号，SSE 握手返回的 endpoint 里即含该前缀，
+# 前置代理据此把后续 POST 转发给持有该会话的 worker
+_WORKER_PATH_RE = re.compile(r"^/w(\d+)(/.*)$")
+
+
+def worker_message_path(index: int) -> str:
+    return f"/w{index}/messages/"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Worker:
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.port = None
+        self.ready = False
+        self.connections = 0
+        self.started_at = 0.0
+        self.failures = 0  # 启动后很快退出的连续次数，用于重启退避
+        self.restart_at = 0.0
+
+
+class WorkerSupervisor:
+    """多进程模式：一个前置进程监听对外端口，把连接转发给若干个 hub worker 进程。
+
+    - 新的 SSE 连接交给当前连接数最少的 worker；会话后续的 POST 按 /w<编号>/ 路径前缀回到同一个 worker
+    - worker 异常退出后自动重启（快速连续崩溃时退避）
+    - 收到 SIGTERM/SIGINT 后停止接收新连接，等待已有连接结束（最多 MCP_HUB_DRAIN_TIMEOUT 秒）再停止 worker
+
+    没有使用 SO_REUSEPORT：内核按连接哈希分配，同一 SSE 会话的 GET 与 POST 可能落到不同进程。
+    """
+
+    def __init__(self, script: str, workers: int, host: str, port: int):
+        self.script = script
+        self.host = host
+        self.port = port
+        self.workers = [_Worker(i) for i in range(workers)]
+        self._round_robin = itertools.count()
+        self._active = set()
+        self._stopping = None
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopping.set)
+
+        for worker in self.workers:
+            self._spawn(worker)
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Hub listening on http://%s:%d with %d workers", self.host, self.port, len(self.workers))
+        monitor = asyncio.create_task(self._monitor())
+        try:
+            await self._stopping.wait()
+        finally:
+            logger.info("Shutting down: draining %d connections", len(self._active))
+            server.close()
+            monitor.cancel()
+            await self._drain()
+            await asyncio.to_thread(self._stop_workers)
+
+    def _spawn(self, worker: _Worker):
+        worker.port = _free_port()
+        worker.ready = False
+        worker.started_at = time.monotonic()
+        env = {
+            **os.environ,
+            "MCP_HUB_WORKERS": "1",
+            "MCP_HUB_WORKER_ID": str(worker.index),
+            "MCP_HUB_HOST": "127.0.0.1",
+            "MCP_HUB_PORT": str(worker.port),
+            "MCP_HUB_MESSAGE_PATH": worker_message_path(worker.index),
+        }
+        worker.process = subprocess.Popen([sys.executable, self.script], env=env)
+        logger.info("Started worker %d (pid %d, port %d)", worker.index, worker.process.pid, worker.port)
+
+    async def _monitor(self):
+        while True:
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.process is None:
+                    if now >= worker.restart_at:
+                        self._spawn(worker)
+                    continue
+                code = worker.process.poll()
+                if code is not None:
+                    worker.ready = False
+                    worker.process = None
+                    # 启动后 10 秒内就退出视为快速崩溃，按 1, 2, 4 ... 30 秒退避后再拉起
+                    worker.failures = worker.failures + 1 if now - worker.started_at < 10 else 0
+                    delay = min(30, 2 ** (worker.failures - 1)) if worker.failures else 0
+                    worker.restart_at = now + delay
+                    logger.warning("Worker %d exited with code %s, restarting in %ss", worker.index, code, delay)
+                elif not worker.ready:
+                    worker.ready = await self._probe(worker)
+                    if not worker.ready and now - worker.started_at > _START_TIMEOUT:
+                        logger.warning("Worker %d not listening after %ss, killing it", worker.index, _START_TIMEOUT)
+                        worker.process.kill()
+            await asyncio.sleep(0.5)
+
+    async def _probe(self, worker: _Worker) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", worker.port), 1)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        return True
+
+    def _route(self, target: str):
+        """返回 (worker, 转发给 worker 的请求路径)"""
+        match = _WORKER_PATH_RE.match(target)
+        if match:
+            worker = self.workers[int(match.group(1))] if int(match.group(1)) < len(self.workers) else None
+            if worker is None or not worker.ready:
+                return None, target
+            # 消息路径原样转发；其余带前缀的路径（如 /w0/metrics）去掉前缀后交给指定 worker
+            if target.startswith(worker_message_path(worker.index)):
+                return worker, target
+            return worker, match.group(2)
+        ready = [w for w in self.workers if w.ready]
+        if not ready:
+            return None, target
+        offset = next(self._round_robin)
+        ready = ready[offset % len(ready):] + ready[:offset % len(ready)]
+        return min(ready, key=lambda w: w.connections), target
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._active.add(task)
+        try:
+            await self._proxy(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        finally:
+            self._active.discard(task)
+            writer.close()
+
+    async def _proxy(self, reader, writer):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), _HEADER_TIMEOUT)
+        if len(head) > _MAX_HEADER_BYTES:
+            return
+        request_line, *headers = head[:-4].decode("latin-1").split("\r\n")
+        method, target, version = request_line.split(" ", 2)
+        worker, routed = self._route(target)
+        # 启动或重启期间短暂没有可用 worker 时稍等片刻，而不是立刻拒绝
+        deadline = time.monotonic() + _HEADER_TIMEOUT
+        while worker is None and time.monotonic() < deadline and not self._stopping.is_set():
+            await asyncio.sleep(0.2)
+            worker, routed = self._route(target)
+        target = routed
+        if worker is None:
+            await self._reply(writer, "503 Service Unavailable", "No hub worker available\n")
+            return
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+        except OSError:
+            await self._reply(writer, "502 Bad Gateway", "Hub worker unreachable\n")
+            return
+
+        # 一个连接只路由一次，因此要求 worker 处理完本次请求就关闭连接，避免 keep-alive 请求跑到别的会话
+        headers = [h for h in headers if h.split(":", 1)[0].strip().lower() not in ("connection", "keep-alive")]
+        headers.append("Connection: close")
+        upstream_writer.write(("\r\n".join([f"{method} {target} {version}", *headers]) + "\r\n\r\n").encode("latin-1"))
+
+        worker.connections += 1
+        try:
+            upload = asyncio.create_task(self._pipe(reader, upstream_writer))
+            download = asyncio.create_task(self._pipe(upstream_reader, writer))
+            await asyncio.wait({upload, download}, return_when=asyncio.FIRST_COMPLETED)
+            if upload.done() and not download.done() and upload.exception() is None:
+                # 客户端只是发完了请求体（半关闭），继续把响应传回去
+                await download
+            for task in (upload, download):
+                task.cancel()
+        finally:
+            worker.connections -= 1
+            upstream_writer.close()
+
+    async def _pipe(self, reader, writer):
+        while True:
+            data = await reader.read(_CHUNK)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    async def _reply(self, writer, status: str, body: str):
+        payload = body.encode("utf-8")
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _drain(self):
+        deadline = time.monotonic() + _DRAIN_TIMEOUT
+        while self._active and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        # 超时仍未结束的连接（通常是长连接的 SSE 会话）直接断开，客户端会重连到新进程
+        for task in list(self._active):
+            task.cancel()
+        if self._active:
+            await asyncio.gather(*self._active, return_exceptions=True)
+
+    def _stop_workers(self):
+        running = [w.process for w in self.workers if w.process is not None and w.process.poll() is None]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + _STOP_TIMEOUT
+        for process in running:
+            try:
+                process.wait(timeout=max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        logger.info("All workers stopped")
+
+
+def run_workers(script: str, workers: int, host: str, port: int):
+    """以多进程模式运行 hub：script 为每个 worker 执行的入口脚本（通常是 main.py）"""
+    WorkerSupervisor(script, workers, host, port).run()
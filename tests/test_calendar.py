@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from services.calendar_backends import IcsBackend, make_event, make_reminder, parse_time
+from services.calendar_service import _add_batch
+
+
+@pytest.mark.parametrize("value", [None, 5, "", "  ", ["2026-01-30"]])
+def test_parse_time_rejects_non_strings_with_value_error(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
+
+
+def test_parse_time_accepts_iso_formats():
+    assert parse_time("2026-01-30 08:00").hour == 8
+    assert parse_time("2026-01-30T08:00:00").minute == 0
+
+
+def test_make_event_validates_fields():
+    with pytest.raises(ValueError, match="title"):
+        make_event(None, "2026-01-30 08:00:00")
+    with pytest.raises(ValueError, match="start_time"):
+        make_event("航班", None)
+    with pytest.raises(ValueError, match="end_time"):
+        make_event("航班", "2026-01-30 08:00:00", "2026-01-30 07:00:00")
+    assert make_reminder("值机").due is None
+
+
+def test_add_batch_reports_invalid_items_individually(tmp_path):
+    backend = IcsBackend(str(tmp_path / "calendar.ics"))
+    events = [
+        {"title": "缺少开始时间"},
+        {"title": "类型错误", "start_time": 5},
+        "不是对象",
+        {"title": "正常", "start_time": "2026-01-30 08:00:00"},
+    ]
+    output = asyncio.run(_add_batch(
+        events, lambda e: make_event(e.get("title"), e.get("start_time"), e.get("end_time")),
+        backend.add_events, "已添加"))
+
+    lines = output.splitlines()
+    assert lines[0] == "已添加 1/4 条"
+    assert lines[1].startswith("1. ❌ 参数错误: start_time")
+    assert lines[2].startswith("2. ❌ 参数错误: start_time")
+    assert lines[3].startswith("3. ❌ 参数错误")
+    assert lines[4] == "4. ✅ 正常"
+    content = (tmp_path / "calendar.ics").read_text(encoding="utf-8")
+    assert content.count("BEGIN:VEVENT") == 1
+
+
+def _write_events(path, worker, count):
+    backend = IcsBackend(path)
+    for i in range(count):
+        asyncio.run(backend.add_events([make_event(f"worker{worker}-{i}", "2026-01-30 08:00:00")]))
+
+
+def test_ics_file_writes_from_several_processes_are_not_lost(tmp_path):
+    import multiprocessing
+
+    path = str(tmp_path / "calendar.ics")
+    processes = [multiprocessing.Process(target=_write_events, args=(path, worker, 20)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+    with open(path, encoding="utf-8") as f:
+        assert f.read().count("BEGIN:VEVENT") == 80
@@ -0,0 +1,108 @@
+import asyncio
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.http_fetch import close_client, fetch_http, needs_browser
+from services.web_search_service import _load_url
+
+STATIC_PAGE = """<html><head><title>static</title></head><body>
+<nav>首页 | 关于</nav>
+<article><h1>静态页面</h1><p>{}</p></article>
+</body></html>""".format("这是一段直接写在 HTML 里的正文，不需要执行 JavaScript 就能读到。" * 10)
+
+JS_SHELL_PAGE = """<html><head><script src="/app.js"></script></head><body>
+<noscript>You need to enable JavaScript to run this app.</noscript>
+<div id="root"></div>
+</body></html>"""
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class _RecordingExecutor:
+    """代替 web 执行器：记录是否回退到浏览器，并返回固定的渲染结果"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, func, *args):
+        self.calls.append(func.__name__)
+        return "浏览器渲染后的正文"
+
+
+@pytest.fixture(scope="module")
+def site(tmp_path_factory):
+    root = tmp_path_factory.mktemp("site")
+    (root / "static.html").write_text(STATIC_PAGE, encoding="utf-8")
+    (root / "shell.html").write_text(JS_SHELL_PAGE, encoding="utf-8")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=str(root)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _run(coro):
+    # httpx 客户端绑定在事件循环上，每个测试结束时关闭，下个测试的新循环会重新创建
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+
+    return asyncio.run(main())
+
+
+def test_fetch_http_extracts_static_page(site):
+    page = _run(fetch_http(f"{site}/static.html"))
+    assert page.status == 200
+    assert page.content_type == "text/html"
+    assert "静态页面" in page.text
+    assert needs_browser(page) is None
+
+
+def test_needs_browser_detects_js_shell(site):
+    page = _run(fetch_http(f"{site}/shell.html"))
+    assert page.status == 200
+    assert needs_browser(page) == "noscript 提示需要 JavaScript"
+
+
+def test_needs_browser_on_http_error(site):
+    page = _run(fetch_http(f"{site}/missing.html"))
+    assert needs_browser(page) == "HTTP 404"
+
+
+def test_auto_mode_serves_static_page_over_http(site):
+    executor = _RecordingExecutor()
+    text, source = _run(_load_url(executor, f"{site}/static.html?case=auto", "auto", "full"))
+    assert source == "HTTP"
+    assert "静态页面" in text
+    assert executor.calls == []
+
+
+def test_auto_mode_falls_back_to_browser_for_js_shell(site):
+    executor = _RecordingExecutor()
+    text, source = _run(_load_url(executor, f"{site}/shell.html?case=auto", "auto", "full"))
+    assert source == "浏览器"
+    assert text == "浏览器渲染后的正文"
+    assert executor.calls == ["_browse_url"]
+
+
+def test_http_mode_never_falls_back(site):
+    executor = _RecordingExecutor()
+    _, source = _run(_load_url(executor, f"{site}/shell.html?case=http", "http", "full"))
+    assert source == "HTTP"
+    assert executor.calls == []
+
+
+def test_browser_mode_skips_http(site):
+    executor = _RecordingExecutor()
+    _, source = _run(_load_url(executor, f"{site}/static.html?case=browser", "browser", "full"))
+    assert source == "浏览器"
+    assert executor.calls == ["_browse_url"]
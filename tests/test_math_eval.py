@@ -0,0 +1,95 @@
+import json
+import time
+
+import pytest
+
+from services.math_eval import compile_expression, evaluate, evaluate_batch
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os')",
+    "_binop('Add', 1, 2)",
+    "_secret",
+    "(1).__class__",
+    "xs.append",
+    "open('x')",
+    "sum(x for x in [1])",
+    "lambda: 1",
+    "'a' * 3",
+    "sum(xs, start=1)",
+])
+def test_rejects_unsafe_syntax(source):
+    with pytest.raises(ValueError):
+        evaluate(source, {"xs": [1, 2]})
+
+
+def test_cannot_assign_private_or_builtin_names():
+    results = evaluate_batch(["_x = 1", "sum = 1", "pi = 3"])
+    assert all("error" in r for r in results[1:])
+
+
+def test_statistics_and_vector_arithmetic():
+    xs = list(range(1, 11))
+    assert evaluate("mean(xs)", {"xs": xs}) == 5.5
+    assert evaluate("percentile(xs, [25, 50, 90])", {"xs": xs}) == [3.25, 5.5, 9.1]
+    assert evaluate("dot(a, b)", {"a": [1, 2, 3], "b": [4, 5, 6]}) == 32.0
+    assert evaluate("sqrt(xs) * 2", {"xs": [1, 4, 9]}) == [2.0, 4.0, 6.0]
+    # 数组与整数相乘是逐元素运算，不是列表重复
+    assert evaluate("[[1], [2]] * 3") == [[3], [6]]
+
+
+@pytest.mark.parametrize("source", ["10**10**10", "2**200000", "3**100000"])
+def test_power_size_guard(source):
+    with pytest.raises(ValueError):
+        evaluate(source)
+
+
+def test_repeated_squaring_is_bounded():
+    started = time.monotonic()
+    results = evaluate_batch(["x = 10**25000"] + ["x = x * x"] * 10)
+    with pytest.raises(ValueError, match="乘法结果过大"):
+        evaluate("((x * x) * (x * x)) * ((x * x) * (x * x))", {"x": 10 ** 4000})
+    assert time.monotonic() - started < 1
+    assert all("error" in r for r in results[1:])
+
+
+def test_integer_variables_are_bounded():
+    with pytest.raises(ValueError):
+        evaluate("v + 1", {"v": 1 << 200000})
+    with pytest.raises(ValueError):
+        evaluate("sum(xs)", {"xs": [1, 1 << 200000]})
+
+
+def test_batch_reports_errors_per_entry():
+    results = evaluate_batch(["t = dot(p, q)", "t * 2", "1/0", "y", "bad(", "10**5000", "inf", 5, "t + 1"],
+                             {"p": [1, 2], "q": [3, 4]})
+    assert [r.get("value") for r in results[:2]] == [11.0, 22.0]
+    assert results[2]["error"] == "除数不能为 0"
+    assert results[3]["error"] == "未定义的变量: y"
+    assert "语法错误" in results[4]["error"]
+    assert "过大" in results[5]["error"]
+    assert "有限" in results[6]["error"]
+    assert "字符串" in results[7]["error"]
+    assert results[8]["value"] == 12.0
+    # 整批结果始终是合法的 JSON
+    json.dumps(results, allow_nan=False)
+
+
+def test_failed_assignment_does_not_bind():
+    results = evaluate_batch(["x = 1/0", "x"])
+    assert results[1]["error"] == "未定义的变量: x"
+
+
+def test_parsed_expressions_are_cached():
+    compile_expression.cache_clear()
+    for _ in range(3):
+        evaluate("a * b + 1", {"a": 2, "b": 3})
+    assert compile_expression.cache_info().hits == 2
+
+
+def test_results_too_long_to_print_are_per_entry_errors():
+    results = evaluate_batch(["1 + 1", "10**5000", "[1, 10**5000]"])
+    assert results[0]["value"] == 2
+    assert "无法输出" in results[1]["error"]
+    assert "无法输出" in results[2]["error"]
+    json.dumps(results, allow_nan=False)
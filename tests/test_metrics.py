@@ -0,0 +1,34 @@
+import asyncio
+
+from services.metrics import TOOL_CALLS, TOOL_ERRORS, instrument_tool, report_failure
+
+
+def _count(metric, tool):
+    return metric._values.get(("test", tool), 0)
+
+
+def test_reported_failure_counts_as_error():
+    async def tool(ok: bool) -> str:
+        return "完成" if ok else report_failure("失败: 出错了")
+
+    wrapped = instrument_tool(tool, "reported", "test")
+    assert asyncio.run(wrapped(True)) == "完成"
+    assert asyncio.run(wrapped(False)) == "失败: 出错了"
+    assert _count(TOOL_CALLS, "reported") == 2
+    assert _count(TOOL_ERRORS, "reported") == 1
+
+
+def test_raised_exception_counts_as_error():
+    async def tool():
+        raise ValueError("boom")
+
+    wrapped = instrument_tool(tool, "raised", "test")
+    try:
+        asyncio.run(wrapped())
+    except ValueError:
+        pass
+    assert _count(TOOL_ERRORS, "raised") == 1
+
+
+def test_report_failure_outside_a_tool_call_is_harmless():
+    assert report_failure("x") == "x"
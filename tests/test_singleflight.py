@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.admission import AdmissionController, on_cancel
+from services.executor import get_executor
+from services.singleflight import SingleFlight
+
+
+class _SharedFetch:
+    """模拟共享的浏览器抓取：在线程池中阻塞，取消范围触发时像 browser.abort 一样让抓取失败"""
+
+    def __init__(self, duration: float):
+        self.duration = duration
+        self.starts = 0
+        self.aborted = threading.Event()
+
+    def run(self):
+        self.starts += 1
+        with on_cancel(self.aborted.set):
+            if self.aborted.wait(self.duration):
+                raise RuntimeError("browser killed")
+        return "page"
+
+
+def _tool(flights, fetch):
+    async def fetch_page():
+        return await flights.do("key", lambda: get_executor("web").run(fetch.run))
+
+    return fetch_page
+
+
+def test_deadline_of_one_caller_does_not_abort_shared_fetch():
+    flights = SingleFlight()
+    fetch = _SharedFetch(duration=1.0)
+    admission = AdmissionController({"short": {"timeout": 0.3}})
+    short = admission.wrap(_tool(flights, fetch), "short", "web")
+    patient = admission.wrap(_tool(flights, fetch), "patient", "web")
+
+    async def main():
+        # 带截止时间的调用方先发起，共享任务由它创建
+        first = asyncio.ensure_future(short())
+        await asyncio.sleep(0.05)
+        return await asyncio.gather(first, patient(), return_exceptions=True)
+
+    first, second = asyncio.run(main())
+    assert isinstance(first, TimeoutError)
+    assert second == "page"
+    assert fetch.starts == 1
+    assert not fetch.aborted.is_set()
+
+
+def test_shared_fetch_is_aborted_when_last_waiter_leaves():
+    flights = SingleFlight()
+    fetch = _SharedFetch(duration=5.0)
+    admission = AdmissionController({"short": {"timeout": 0.2}})
+    short = admission.wrap(_tool(flights, fetch), "short", "web")
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await asyncio.gather(short(), short())
+        started = time.monotonic()
+        while not fetch.aborted.is_set() and time.monotonic() - started < 2:
+            await asyncio.sleep(0.01)
+        assert flights.inflight() == 0
+
+    asyncio.run(main())
+    assert fetch.aborted.is_set()
+    assert fetch.starts == 1